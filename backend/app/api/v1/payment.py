@@ -3,44 +3,37 @@ Creem Payment Router — Checkout + Webhook handling.
 Copy to: backend/app/api/v1/payment.py
 Customize: PRODUCTS dict, handle_checkout_completed logic.
 """
-import hmac
 import hashlib
-import json
+import hmac
 import httpx
-from fastapi import APIRouter, Depends, HTTPException, Request, Header
+import orjson
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Header, Response
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import DbSession
 from app.models import GenerationToken, PaymentTransaction
-from app.schemas.payment import Product, CreateCheckoutRequest, CreateCheckoutResponse
+from app.schemas.payment import (
+    Product, CreateCheckoutRequest, CreateCheckoutResponse, CreemEvent, CreemCheckoutObject
+)
 
 
-def get_creem_api_base():
-    """Use test API for test keys, production API for live keys."""
-    if settings.CREEM_API_KEY.startswith("creem_test_"):
-        return "https://test-api.creem.io/v1"
-    return "https://api.creem.io/v1"
+# Use test API for test keys, production API for live keys
+CREEM_API_BASE = (
+    "https://test-api.creem.io/v1"
+    if settings.CREEM_API_KEY.startswith("creem_test_")
+    else "https://api.creem.io/v1"
+)
 
 
-router = APIRouter()
+_WEBHOOK_SECRET = settings.CREEM_WEBHOOK_SECRET.encode()
+WEBHOOK_MAX_BODY_BYTES = 64 * 1024  # Creem events are a few KB
 
-
-@router.get("/payment/products", response_model=list[Product])
-async def get_products():
-    """Get available product packages."""
-    products = []
-    for sku, info in settings.PRODUCTS.items():
-        products.append(
-            Product(
-                sku=sku,
-                name=sku.replace("_", " ").title(),
-                price_cents=info["price"],
-                generations=info["generations"],
-                discount_percent=_calculate_discount(sku) if len(settings.PRODUCTS) > 1 else None,
-            )
-        )
-    return products
+router = APIRouter()
 
 
 def _calculate_discount(sku: str) -> int | None:
@@ -57,125 +50,198 @@ def _calculate_discount(sku: str) -> int | None:
     return int(((max_per_unit - this_per_unit) / max_per_unit) * 100)
 
 
+def _build_products_response() -> list[Product]:
+    """Build the product list; PRODUCTS is static, so this runs once at import."""
+    return [
+        Product(
+            sku=sku,
+            name=sku.replace("_", " ").title(),
+            price_cents=info["price"],
+            generations=info["generations"],
+            discount_percent=_calculate_discount(sku),
+        )
+        for sku, info in settings.PRODUCTS.items()
+    ]
+
+
+_PRODUCTS_RESPONSE: list[Product] = _build_products_response()
+_PRODUCTS_BODY = orjson.dumps([p.model_dump() for p in _PRODUCTS_RESPONSE])
+_PRODUCTS_OPAQUE_TAG = f'"{hashlib.md5(_PRODUCTS_BODY).hexdigest()[:16]}"'
+_PRODUCTS_ETAG = f"W/{_PRODUCTS_OPAQUE_TAG}"
+_PRODUCTS_HEADERS = {"Cache-Control": "public, max-age=3600", "ETag": _PRODUCTS_ETAG}
+
+
+def _products_not_modified(if_none_match: Optional[str]) -> bool:
+    """Weak If-None-Match comparison: any listed tag or `*` matches, W/ ignored."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag in ("*", _PRODUCTS_OPAQUE_TAG):
+            return True
+    return False
+
+
+@router.get("/payment/products", response_model=list[Product])
+async def get_products(request: Request):
+    """Get available product packages."""
+    if _products_not_modified(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=_PRODUCTS_HEADERS)
+    return Response(content=_PRODUCTS_BODY, media_type="application/json", headers=_PRODUCTS_HEADERS)
+
+
 @router.post("/payment/create-checkout", response_model=CreateCheckoutResponse)
 async def create_checkout(
-    request: CreateCheckoutRequest,
-    db: AsyncSession = Depends(get_db),
+    checkout: CreateCheckoutRequest,
+    request: Request,
+    db: DbSession,
 ):
     """Create a Creem checkout session."""
-    if request.product_sku not in settings.PRODUCTS:
+    if checkout.product_sku not in settings.PRODUCTS:
         raise HTTPException(status_code=400, detail="Invalid product SKU")
 
-    creem_product_id = settings.CREEM_PRODUCT_IDS.get(request.product_sku)
+    creem_product_id = settings.CREEM_PRODUCT_IDS.get(checkout.product_sku)
     if not creem_product_id:
         raise HTTPException(status_code=400, detail="Product not configured in Creem")
 
-    product = settings.PRODUCTS[request.product_sku]
+    product = settings.PRODUCTS[checkout.product_sku]
 
-    try:
-        async with httpx.AsyncClient() as client:
-            payload = {
-                "product_id": creem_product_id,
-                "success_url": request.success_url,
-                "metadata": {
-                    "product_sku": request.product_sku,
-                    "device_id": request.device_id,
-                    "generations": str(product["generations"]),
-                },
-            }
-            if request.optional_email:
-                payload["customer"] = {"email": request.optional_email}
-
-            response = await client.post(
-                f"{get_creem_api_base()}/checkouts",
-                headers={
-                    "Content-Type": "application/json",
-                    "x-api-key": settings.CREEM_API_KEY,
-                },
-                json=payload,
-                timeout=30.0,
-            )
-
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Creem API error: {response.text}",
-                )
-
-            data = response.json()
-            return CreateCheckoutResponse(
-                checkout_url=data["checkout_url"],
-                session_id=data["id"],
-            )
+    payload = {
+        "product_id": creem_product_id,
+        "success_url": checkout.success_url,
+        "metadata": {
+            "product_sku": checkout.product_sku,
+            "device_id": checkout.device_id,
+            "generations": str(product["generations"]),
+        },
+    }
+    if checkout.optional_email:
+        payload["customer"] = {"email": checkout.optional_email}
 
+    try:
+        # Shared client created in the app lifespan keeps connections to Creem warm
+        response = await request.app.state.creem_client.post("/checkouts", json=payload)
     except httpx.RequestError as e:
         raise HTTPException(status_code=500, detail=f"Payment service error: {str(e)}")
 
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Creem API error: {response.text}",
+        )
 
-def verify_creem_signature(payload: bytes, signature: str, secret: str) -> bool:
+    data = response.json()
+    return CreateCheckoutResponse(
+        checkout_url=data["checkout_url"],
+        session_id=data["id"],
+    )
+
+
+def verify_creem_signature(payload: bytes, signature: str, secret: bytes) -> bool:
     """Verify Creem webhook signature using HMAC-SHA256."""
-    expected = hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
-    return hmac.compare_digest(signature, expected)
+    try:
+        sig_bytes = bytes.fromhex(signature)
+    except ValueError:
+        return False
+    expected = hmac.digest(secret, payload, "sha256")
+    return hmac.compare_digest(sig_bytes, expected)
+
+
+async def _read_webhook_body(request: Request) -> bytes:
+    """Read the request body, rejecting anything over WEBHOOK_MAX_BODY_BYTES."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > WEBHOOK_MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Payload too large")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > WEBHOOK_MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail="Payload too large")
+    return bytes(body)
 
 
 @router.post("/webhooks/creem")
 async def creem_webhook(
     request: Request,
+    db: DbSession,
     creem_signature: str = Header(None, alias="creem-signature"),
-    db: AsyncSession = Depends(get_db),
 ):
     """Handle Creem webhook events."""
-    payload = await request.body()
+    payload = await _read_webhook_body(request)
 
     if not creem_signature or not verify_creem_signature(
-        payload, creem_signature, settings.CREEM_WEBHOOK_SECRET
+        payload, creem_signature, _WEBHOOK_SECRET
     ):
         raise HTTPException(status_code=400, detail="Invalid signature")
 
     try:
-        event = json.loads(payload.decode("utf-8"))
-    except Exception:
+        # pydantic-core parses and validates the raw bytes in one pass
+        event = CreemEvent.model_validate_json(payload)
+    except ValidationError:
         raise HTTPException(status_code=400, detail="Invalid JSON payload")
 
-    event_type = event.get("eventType")
-
-    if event_type == "checkout.completed":
-        await _handle_checkout_completed(event, db)
+    # Other event types are acknowledged whatever their object looks like,
+    # so Creem does not keep redelivering them
+    if event.event_type == "checkout.completed":
+        try:
+            checkout = CreemCheckoutObject.model_validate(event.object or {})
+        except ValidationError:
+            raise HTTPException(status_code=400, detail="Invalid checkout payload")
+        await _handle_checkout_completed(checkout, db)
 
     return {"received": True}
 
 
-async def _handle_checkout_completed(event: dict, db: AsyncSession):
+async def _transaction_exists(db: AsyncSession, provider_transaction_id: str) -> bool:
+    """Check whether a Creem checkout has already been recorded."""
+    result = await db.execute(
+        select(PaymentTransaction.id)
+        .where(PaymentTransaction.provider_transaction_id == provider_transaction_id)
+        .limit(1)
+    )
+    return result.first() is not None
+
+
+async def _handle_checkout_completed(checkout: CreemCheckoutObject, db: AsyncSession):
     """Handle successful checkout — create token + record transaction."""
-    obj = event.get("object", {})
-    metadata = obj.get("metadata", {})
-    customer = obj.get("customer", {})
-    order = obj.get("order", {})
+    # The checkout id is what makes redeliveries idempotent, so it is required
+    if not checkout.id:
+        raise HTTPException(status_code=400, detail="Missing checkout id")
 
-    product_sku = metadata.get("product_sku")
-    device_id = metadata.get("device_id")
-    generations = int(metadata.get("generations", 1))
+    # Creem retried an event we already processed
+    if await _transaction_exists(db, checkout.id):
+        return
 
-    # Create token
+    metadata = checkout.metadata
+
+    # Create token (its id is assigned client-side, so no flush is needed before linking)
     token = GenerationToken.create_token(
-        product_sku=product_sku,
-        generations=generations,
-        device_id=device_id,
+        product_sku=metadata.product_sku,
+        generations=metadata.generations,
+        device_id=metadata.device_id,
     )
     db.add(token)
-    await db.flush()  # flush to get token.id before creating transaction
 
     # Record transaction
     transaction = PaymentTransaction(
         token_id=token.id,
-        product_sku=product_sku,
+        product_sku=metadata.product_sku,
         provider="creem",
-        provider_transaction_id=obj.get("id"),
-        amount_cents=order.get("amount"),
-        currency=order.get("currency", "usd"),
+        provider_transaction_id=checkout.id,
+        amount_cents=checkout.order.amount,
+        currency=checkout.order.currency,
         status="succeeded",
-        device_id=device_id,
-        optional_email=customer.get("email"),
+        device_id=metadata.device_id,
+        optional_email=checkout.customer.email,
     )
     db.add(transaction)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        # A concurrent delivery of the same event won the unique index race
+        if await _transaction_exists(db, checkout.id):
+            return
+        # Anything else (e.g. a missing amount) must fail so Creem retries
+        raise
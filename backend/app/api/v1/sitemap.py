@@ -1,17 +1,16 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+import asyncio
 import uuid
 
 from app.schemas.sitemap import (
     CrawlRequest, SitemapResult, CrawlProgress, CrawlStatus
 )
+from app.services import crawl_store
+from app.services.browser import browser_service
 from app.services.crawler import SitemapCrawler
 
 router = APIRouter(prefix="/sitemap", tags=["sitemap"])
 
-# In-memory storage for active crawls (in production, use Redis)
-active_crawls: dict[str, SitemapCrawler] = {}
-completed_crawls: dict[str, SitemapResult] = {}
-
 
 @router.post("/crawl", response_model=dict)
 async def start_crawl(request: CrawlRequest, background_tasks: BackgroundTasks):
@@ -23,17 +22,27 @@ async def start_crawl(request: CrawlRequest, background_tasks: BackgroundTasks):
     
     crawler = SitemapCrawler(
         max_pages=request.max_pages,
-        max_depth=request.max_depth
+        max_depth=request.max_depth,
+        traversal=request.traversal,
+        browser_service=browser_service
     )
     
-    active_crawls[crawl_id] = crawler
+    await crawl_store.put_active(crawl_id, crawler)
     
     async def run_crawl():
-        result = await crawler.crawl(str(request.url))
-        completed_crawls[crawl_id] = result
-        # Clean up active crawl after completion
-        if crawl_id in active_crawls:
-            del active_crawls[crawl_id]
+        # Keep other workers' view of this crawl's progress current
+        refresher = asyncio.create_task(crawl_store.refresh_active(crawl_id, crawler))
+        try:
+            try:
+                result = await crawler.crawl(str(request.url))
+            finally:
+                refresher.cancel()
+                # wait() never raises the refresher's outcome, only our own cancellation
+                await asyncio.wait({refresher})
+            await crawl_store.put_result(crawl_id, result)
+        finally:
+            # Clean up active crawl after completion
+            await crawl_store.drop_active(crawl_id)
     
     # Run crawl in background
     background_tasks.add_task(run_crawl)
@@ -53,7 +62,9 @@ async def crawl_sync(request: CrawlRequest):
     """
     crawler = SitemapCrawler(
         max_pages=request.max_pages,
-        max_depth=request.max_depth
+        max_depth=request.max_depth,
+        traversal=request.traversal,
+        browser_service=browser_service
     )
     
     result = await crawler.crawl(str(request.url))
@@ -67,11 +78,12 @@ async def crawl_sync(request: CrawlRequest):
 @router.get("/crawl/{crawl_id}/progress", response_model=CrawlProgress)
 async def get_progress(crawl_id: str):
     """Get the progress of an active crawl."""
-    if crawl_id in active_crawls:
-        return active_crawls[crawl_id].get_progress()
+    progress = await crawl_store.get_active_progress(crawl_id)
+    if progress is not None:
+        return progress
     
-    if crawl_id in completed_crawls:
-        result = completed_crawls[crawl_id]
+    result = await crawl_store.get_result(crawl_id)
+    if result is not None:
         return CrawlProgress(
             status=result.status,
             pages_crawled=result.total_pages,
@@ -86,10 +98,11 @@ async def get_progress(crawl_id: str):
 @router.get("/crawl/{crawl_id}/result", response_model=SitemapResult)
 async def get_result(crawl_id: str):
     """Get the result of a completed crawl."""
-    if crawl_id in completed_crawls:
-        return completed_crawls[crawl_id]
+    result = await crawl_store.get_result(crawl_id)
+    if result is not None:
+        return result
     
-    if crawl_id in active_crawls:
+    if await crawl_store.get_active_progress(crawl_id) is not None:
         raise HTTPException(
             status_code=202,
             detail="Crawl still in progress"
@@ -101,8 +114,7 @@ async def get_result(crawl_id: str):
 @router.delete("/crawl/{crawl_id}")
 async def delete_crawl(crawl_id: str):
     """Delete a completed crawl result."""
-    if crawl_id in completed_crawls:
-        del completed_crawls[crawl_id]
+    if await crawl_store.drop_result(crawl_id):
         return {"status": "deleted"}
     
     raise HTTPException(status_code=404, detail="Crawl not found")
@@ -3,22 +3,25 @@ Token Router — Query, validate, and list tokens.
 Copy to: backend/app/api/v1/tokens.py
 """
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+from cachetools import TTLCache
+from fastapi import APIRouter, HTTPException
 from sqlalchemy import select
 from pydantic import BaseModel
 
-from app.core.database import get_db
+from app.core.database import DbSession, utcnow
 from app.models import GenerationToken
 
 router = APIRouter()
 
+# Short-lived validation results; 5s bounds staleness after a generation is used
+_valid_cache: TTLCache = TTLCache(maxsize=10_000, ttl=5)
+
 
 class TokenInfo(BaseModel):
     token: str
     remaining_generations: int
     total_generations: int
-    expires_at: str
+    expires_at: datetime
     product_sku: str
 
 
@@ -33,11 +36,11 @@ class ValidateResponse(BaseModel):
 @router.get("/tokens/info/{token}", response_model=TokenInfo)
 async def get_token_info(
     token: str,
-    db: AsyncSession = Depends(get_db),
+    db: DbSession,
 ):
     """Get token information."""
     result = await db.execute(
-        select(GenerationToken).where(GenerationToken.token == token)
+        select(GenerationToken).where(GenerationToken.token == token).limit(1)
     )
     token_obj = result.scalar_one_or_none()
     if not token_obj:
@@ -47,7 +50,7 @@ async def get_token_info(
         token=token_obj.token,
         remaining_generations=token_obj.remaining_generations,
         total_generations=token_obj.total_generations,
-        expires_at=token_obj.expires_at.isoformat(),
+        expires_at=token_obj.expires_at,
         product_sku=token_obj.product_sku,
     )
 
@@ -55,43 +58,52 @@ async def get_token_info(
 @router.post("/tokens/validate", response_model=ValidateResponse)
 async def validate_token(
     token: str,
-    db: AsyncSession = Depends(get_db),
+    db: DbSession,
 ):
     """Validate if a token is valid and has remaining generations."""
+    valid = _valid_cache.get(token)
+    if valid is not None:
+        return ValidateResponse(valid=valid)
+
     result = await db.execute(
-        select(GenerationToken).where(GenerationToken.token == token)
+        select(GenerationToken.is_valid_at(utcnow()))
+        .where(GenerationToken.token == token)
+        .limit(1)
     )
-    token_obj = result.scalar_one_or_none()
-    if not token_obj:
-        return ValidateResponse(valid=False)
-    return ValidateResponse(valid=token_obj.is_valid)
+    valid = bool(result.scalar_one_or_none())
+    _valid_cache[token] = valid
+    return ValidateResponse(valid=valid)
 
 
 @router.get("/tokens/by-device/{device_id}", response_model=TokenListResponse)
 async def get_tokens_by_device(
     device_id: str,
-    db: AsyncSession = Depends(get_db),
+    db: DbSession,
 ):
     """Get all valid tokens for a device."""
-    now = datetime.utcnow()
+    now = utcnow()
     result = await db.execute(
-        select(GenerationToken).where(
+        select(
+            GenerationToken.token,
+            GenerationToken.remaining_generations,
+            GenerationToken.total_generations,
+            GenerationToken.expires_at,
+            GenerationToken.product_sku,
+        ).where(
             GenerationToken.device_id == device_id,
-            GenerationToken.remaining_generations > 0,
-            GenerationToken.expires_at > now,
+            GenerationToken.is_valid_at(now),
         )
     )
-    tokens = result.scalars().all()
 
     return TokenListResponse(
         tokens=[
             TokenInfo(
-                token=t.token,
-                remaining_generations=t.remaining_generations,
-                total_generations=t.total_generations,
-                expires_at=t.expires_at.isoformat(),
-                product_sku=t.product_sku,
+                token=token,
+                remaining_generations=remaining,
+                total_generations=total,
+                expires_at=expires_at,
+                product_sku=product_sku,
             )
-            for t in tokens
+            for token, remaining, total, expires_at, product_sku in result.all()
         ]
     )
@@ -15,6 +15,18 @@ class Settings(BaseSettings):
     MAX_DEPTH: int = 3
     CRAWL_TIMEOUT: int = 30000  # ms per page
     TOTAL_TIMEOUT: int = 300  # seconds for entire crawl
+    CRAWL_CONCURRENCY: int = 4  # browser pages crawled in parallel
+    CRAWL_PER_HOST_CONCURRENCY: int = 4  # politeness cap per hostname
+    CRAWL_MIN_DELAY: float = 0.1  # seconds between requests to the same host
+    CRAWL_STATIC_FETCH: bool = True  # try plain HTTP before launching a page load
+    STATIC_MIN_ANCHORS: int = 5  # fewer anchors than this falls back to the browser
+    STATIC_MAX_FALLBACKS: int = 3  # browser fallbacks before a host skips the static path
+    
+    # Crawl store (empty REDIS_URL keeps results in-process)
+    REDIS_URL: str = ""
+    CRAWL_RESULT_TTL: int = 86400  # seconds
+    CRAWL_STORE_MAX_ENTRIES: int = 1000
+    CRAWL_PROGRESS_INTERVAL: float = 1.0  # seconds between shared progress snapshots
     
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./data/app.db"
@@ -1,4 +1,8 @@
 """Database configuration using SQLAlchemy async."""
+from datetime import datetime, timezone
+from typing import Annotated
+
+from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
@@ -15,6 +19,11 @@ async_session_maker = async_sessionmaker(
 Base = declarative_base()
 
 
+def utcnow() -> datetime:
+    """Current UTC time as a naive datetime, matching how DateTime columns are stored."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 async def get_db():
     """Dependency for getting async database sessions."""
     async with async_session_maker() as session:
@@ -28,6 +37,9 @@ async def get_db():
             await session.close()
 
 
+DbSession = Annotated[AsyncSession, Depends(get_db)]
+
+
 async def init_db():
     """Initialize database tables."""
     async with engine.begin() as conn:
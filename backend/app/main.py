@@ -1,19 +1,51 @@
-from contextlib import asynccontextmanager
+import logging
+from contextlib import AsyncExitStack, asynccontextmanager
+import httpx
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
 from app.core.config import settings
 from app.core.database import init_db
+from app.services import crawl_store
+from app.services.browser import browser_service
 from app.api.v1.sitemap import router as sitemap_router
-from app.api.v1.payment import router as payment_router
+from app.api.v1.payment import router as payment_router, CREEM_API_BASE
 from app.api.v1.tokens import router as tokens_router
 
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup."""
-    await init_db()
-    yield
+    """Initialize database, shared HTTP client and browser on startup."""
+    # Cleanups run in reverse order and each one runs even if an earlier one raises
+    async with AsyncExitStack() as cleanup:
+        await init_db()
+        cleanup.push_async_callback(browser_service.stop)
+        try:
+            await browser_service.start()
+        except Exception:
+            # Keep payment, token and health endpoints up; crawls fall back to
+            # launching their own browser while the shared one is not running
+            logger.exception("Shared Chromium failed to launch")
+        cleanup.push_async_callback(crawl_store.close)
+        app.state.creem_client = httpx.AsyncClient(
+            base_url=CREEM_API_BASE,
+            headers={
+                "Content-Type": "application/json",
+                "x-api-key": settings.CREEM_API_KEY,
+            },
+            limits=httpx.Limits(
+                max_keepalive_connections=20,
+                max_connections=100,
+                keepalive_expiry=60.0,
+            ),
+            timeout=httpx.Timeout(30.0),
+        )
+        cleanup.push_async_callback(app.state.creem_client.aclose)
+        yield
 
 
 app = FastAPI(
@@ -22,7 +54,8 @@ app = FastAPI(
     description="Deep scan any website and generate an interactive visual sitemap",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
 )
 
 # CORS
@@ -34,6 +67,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses such as sitemap results
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Routes
 app.include_router(sitemap_router, prefix="/api/v1")
 app.include_router(payment_router, prefix="/api/v1")
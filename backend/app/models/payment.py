@@ -2,11 +2,10 @@
 PaymentTransaction Model — Records all payment events.
 """
 import uuid
-from datetime import datetime
 from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 
-from app.core.database import Base
+from app.core.database import Base, utcnow
 
 
 class PaymentTransaction(Base):
@@ -22,6 +21,6 @@ class PaymentTransaction(Base):
     status = Column(String(20), nullable=False)  # succeeded, failed, refunded
     device_id = Column(String(255))
     optional_email = Column(String(255))
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=utcnow, index=True)
 
     token = relationship("GenerationToken", back_populates="transactions")
@@ -3,14 +3,19 @@ GenerationToken Model — Token-based usage tracking.
 """
 import uuid
 from datetime import datetime, timedelta
-from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy import Column, String, Integer, DateTime, Index
+from sqlalchemy.ext.hybrid import hybrid_method
 from sqlalchemy.orm import relationship
 
-from app.core.database import Base
+from app.core.database import Base, utcnow
 
 
 class GenerationToken(Base):
     __tablename__ = "generation_tokens"
+    __table_args__ = (
+        # Serves the by-device lookup of unexpired tokens with generations left
+        Index("ix_tokens_device_valid", "device_id", "expires_at", "remaining_generations"),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     token = Column(String(255), unique=True, nullable=False, index=True)
@@ -19,8 +24,8 @@ class GenerationToken(Base):
     remaining_generations = Column(Integer, nullable=False)
     expires_at = Column(DateTime, nullable=False, index=True)
     device_id = Column(String(255), index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
 
     # Add relationships as needed:
     # generations = relationship("YourGenerationModel", back_populates="token")
@@ -30,21 +35,30 @@ class GenerationToken(Base):
     def create_token(cls, product_sku: str, generations: int, device_id: str = None):
         """Create a new token with 1 year validity."""
         return cls(
+            id=str(uuid.uuid4()),
             token=f"tok_{uuid.uuid4().hex}",
             product_sku=product_sku,
             total_generations=generations,
             remaining_generations=generations,
-            expires_at=datetime.utcnow() + timedelta(days=365),
+            expires_at=utcnow() + timedelta(days=365),
             device_id=device_id,
         )
 
-    def use_generation(self) -> bool:
+    def use_generation(self, now: datetime = None) -> bool:
         """Consume one generation. Returns True if successful."""
-        if self.remaining_generations > 0 and datetime.utcnow() < self.expires_at:
+        if self.is_valid_at(now or utcnow()):
             self.remaining_generations -= 1
             return True
         return False
 
+    @hybrid_method
+    def is_valid_at(self, now: datetime) -> bool:
+        """Check validity at a given time, so bulk checks can read the clock once.
+
+        Also usable on the class as a SQL filter, so queries share this predicate.
+        """
+        return (self.remaining_generations > 0) & (self.expires_at > now)
+
     @property
     def is_valid(self) -> bool:
-        return self.remaining_generations > 0 and datetime.utcnow() < self.expires_at
+        return self.is_valid_at(utcnow())
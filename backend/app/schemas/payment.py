@@ -2,11 +2,13 @@
 Payment Schemas — Pydantic models for payment API.
 Copy to: backend/app/schemas/payment.py
 """
-from typing import Optional
-from pydantic import BaseModel
+from typing import Any, Optional
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 class Product(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
     sku: str
     name: str
     price_cents: int
@@ -15,6 +17,8 @@ class Product(BaseModel):
 
 
 class CreateCheckoutRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
     product_sku: str
     device_id: str
     optional_email: Optional[str] = None
@@ -23,5 +27,47 @@ class CreateCheckoutRequest(BaseModel):
 
 
 class CreateCheckoutResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
     checkout_url: str
     session_id: str
+
+
+# Creem webhook payloads. Unknown fields are ignored since Creem may add more.
+
+class _CreemModel(BaseModel):
+    @model_validator(mode="before")
+    @classmethod
+    def _null_means_default(cls, data):
+        """Treat explicit nulls like missing keys so field defaults apply."""
+        if isinstance(data, dict):
+            return {k: v for k, v in data.items() if v is not None}
+        return data
+
+
+class CreemMetadata(_CreemModel):
+    product_sku: Optional[str] = None
+    device_id: Optional[str] = None
+    generations: int = 1
+
+
+class CreemCustomer(_CreemModel):
+    email: Optional[str] = None
+
+
+class CreemOrder(_CreemModel):
+    amount: Optional[int] = None
+    currency: str = "usd"
+
+
+class CreemCheckoutObject(_CreemModel):
+    id: Optional[str] = None
+    metadata: CreemMetadata = Field(default_factory=CreemMetadata)
+    customer: CreemCustomer = Field(default_factory=CreemCustomer)
+    order: CreemOrder = Field(default_factory=CreemOrder)
+
+
+class CreemEvent(BaseModel):
+    """Envelope only; `object` is validated per event type by the handler."""
+    event_type: Optional[str] = Field(None, alias="eventType")
+    object: Any = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl, Field
-from typing import Optional
+from typing import Literal, Optional
 from enum import Enum
 
 
@@ -15,6 +15,10 @@ class CrawlRequest(BaseModel):
     url: HttpUrl = Field(..., description="Target website URL to crawl")
     max_depth: int = Field(default=3, ge=1, le=5, description="Maximum crawl depth")
     max_pages: int = Field(default=100, ge=1, le=500, description="Maximum pages to crawl")
+    traversal: Optional[Literal["bfs", "dfs"]] = Field(
+        default=None,
+        description="Crawl order; defaults to bfs, dfs keeps the frontier smaller on deep crawls"
+    )
 
 
 class PageNode(BaseModel):
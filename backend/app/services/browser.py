@@ -0,0 +1,47 @@
+"""
+Browser Service — One long-lived Chromium per worker process.
+
+Launching Chromium takes hundreds of milliseconds, so the app starts it once
+in its lifespan and each crawl only opens (and closes) its own context.
+"""
+from typing import Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+
+
+class BrowserService:
+    """Holds the shared Playwright driver and browser."""
+
+    def __init__(self):
+        self._playwright: Optional[Playwright] = None
+        self.browser: Optional[Browser] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+    async def start(self):
+        """Start Playwright and launch headless Chromium."""
+        self._playwright = await async_playwright().start()
+        try:
+            self.browser = await self._playwright.chromium.launch(headless=True)
+        except Exception:
+            # Don't leave the driver process behind when Chromium can't launch
+            await self.stop()
+            raise
+
+    async def stop(self):
+        """Close the browser and stop Playwright."""
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def new_context(self, **kwargs) -> BrowserContext:
+        """Open an isolated context on the shared browser."""
+        return await self.browser.new_context(**kwargs)
+
+
+browser_service = BrowserService()
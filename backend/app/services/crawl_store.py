@@ -0,0 +1,132 @@
+"""
+Crawl Store — Shared registry for active crawls and completed results.
+
+Completed results go to Redis when REDIS_URL is configured so every worker
+sees the same state; otherwise they live in a bounded in-process LRU cache.
+Active crawlers are live objects and always stay in the worker running them;
+with Redis enabled, other workers see the crawl through a progress snapshot
+that refresh_active rewrites while the crawl runs.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from cachetools import LRUCache
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.schemas.sitemap import SitemapResult, CrawlProgress
+from app.services.crawler import SitemapCrawler
+
+RESULT_KEY = "crawl:result:{}"
+ACTIVE_KEY = "crawl:active:{}"
+
+# Running crawls must never be evicted; entries are removed by drop_active
+_active: dict[str, SitemapCrawler] = {}
+_results: LRUCache = LRUCache(maxsize=settings.CRAWL_STORE_MAX_ENTRIES)
+_redis = None
+
+logger = logging.getLogger(__name__)
+
+
+def _get_redis():
+    """Lazily create the Redis client, or return None when Redis is disabled."""
+    global _redis
+    if not settings.REDIS_URL:
+        return None
+    if _redis is None:
+        _redis = Redis.from_url(settings.REDIS_URL)
+    return _redis
+
+
+async def close():
+    """Close the Redis connection pool, if one was opened."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+async def _write_progress(redis, crawl_id: str, crawler: SitemapCrawler):
+    await redis.set(
+        ACTIVE_KEY.format(crawl_id),
+        crawler.get_progress().model_dump_json(),
+        ex=settings.CRAWL_RESULT_TTL,
+    )
+
+
+async def put_active(crawl_id: str, crawler: SitemapCrawler):
+    """Register a crawler that is running in this worker."""
+    _active[crawl_id] = crawler
+    redis = _get_redis()
+    if redis is not None:
+        await _write_progress(redis, crawl_id, crawler)
+
+
+async def refresh_active(
+    crawl_id: str,
+    crawler: SitemapCrawler,
+    interval: float = settings.CRAWL_PROGRESS_INTERVAL,
+):
+    """Rewrite the shared progress snapshot every interval until cancelled."""
+    redis = _get_redis()
+    if redis is None:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await _write_progress(redis, crawl_id, crawler)
+        except Exception:
+            # A missed snapshot only makes progress stale; keep the crawl going
+            logger.exception("Failed to refresh progress for crawl %s", crawl_id)
+
+
+async def drop_active(crawl_id: str):
+    """Forget an active crawler once it has finished."""
+    _active.pop(crawl_id, None)
+    redis = _get_redis()
+    if redis is not None:
+        await redis.delete(ACTIVE_KEY.format(crawl_id))
+
+
+async def get_active_progress(crawl_id: str) -> Optional[CrawlProgress]:
+    """Return live progress for an active crawl, or None if it is not running."""
+    crawler = _active.get(crawl_id)
+    if crawler is not None:
+        return crawler.get_progress()
+    redis = _get_redis()
+    if redis is not None:
+        data = await redis.get(ACTIVE_KEY.format(crawl_id))
+        if data is not None:
+            return CrawlProgress.model_validate_json(data)
+    return None
+
+
+async def put_result(crawl_id: str, result: SitemapResult):
+    """Store a completed crawl result."""
+    redis = _get_redis()
+    if redis is not None:
+        await redis.set(
+            RESULT_KEY.format(crawl_id),
+            result.model_dump_json(),
+            ex=settings.CRAWL_RESULT_TTL,
+        )
+    else:
+        _results[crawl_id] = result
+
+
+async def get_result(crawl_id: str) -> Optional[SitemapResult]:
+    """Fetch a completed crawl result, or None if unknown or evicted."""
+    redis = _get_redis()
+    if redis is not None:
+        data = await redis.get(RESULT_KEY.format(crawl_id))
+        return SitemapResult.model_validate_json(data) if data is not None else None
+    return _results.get(crawl_id)
+
+
+async def drop_result(crawl_id: str) -> bool:
+    """Delete a completed crawl result. Returns True if it existed."""
+    redis = _get_redis()
+    if redis is not None:
+        return bool(await redis.delete(RESULT_KEY.format(crawl_id)))
+    return _results.pop(crawl_id, None) is not None
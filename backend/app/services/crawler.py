@@ -1,59 +1,159 @@
 import asyncio
+import functools
 import hashlib
+import re
 import time
+from array import array
+from html.parser import HTMLParser
 from urllib.parse import urljoin, urlparse
+from dataclasses import dataclass
 from typing import Optional
-from collections import defaultdict
 
-from playwright.async_api import async_playwright, Browser, Page, TimeoutError as PlaywrightTimeout
+import httpx
+from playwright.async_api import (
+    async_playwright, Browser, BrowserContext, Page, Route, TimeoutError as PlaywrightTimeout
+)
 
 from app.core.config import settings
+from app.services.browser import BrowserService
 from app.schemas.sitemap import (
     PageNode, PageLink, SitemapResult, CrawlStatus, CrawlProgress
 )
 
 
+@functools.lru_cache(maxsize=200_000)
 def url_to_id(url: str) -> str:
     """Generate a short unique ID for a URL."""
-    return hashlib.md5(url.encode()).hexdigest()[:12]
+    # Non-cryptographic use: a 48-bit BLAKE2b digest is all the ID keeps
+    return hashlib.blake2b(url.encode(), digest_size=6).hexdigest()
+
+
+# Everything before the query, then the query (if non-empty); the fragment is dropped
+_NORMALIZE_RE = re.compile(r"^([^?#]*)(\?[^#]+)?")
 
 
+@functools.lru_cache(maxsize=100_000)
 def normalize_url(url: str) -> str:
     """Normalize URL by removing fragments and trailing slashes."""
-    parsed = urlparse(url)
-    # Remove fragment, keep query
-    normalized = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-    if parsed.query:
-        normalized += f"?{parsed.query}"
-    return normalized.rstrip("/")
+    match = _NORMALIZE_RE.match(url)
+    return (match.group(1) + (match.group(2) or "")).rstrip("/")
+
+
+# Common non-page extensions
+_SKIP_EXTENSIONS = (
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico',
+    '.css', '.js', '.json', '.xml', '.txt', '.pdf', '.doc', '.docx',
+    '.zip', '.tar', '.gz', '.mp3', '.mp4', '.webm', '.woff', '.woff2',
+    '.ttf', '.eot', '.otf'
+)
+
+
+# Only the path's tail can match, so lowercase just that many characters
+_SKIP_TAIL = max(map(len, _SKIP_EXTENSIONS))
+
+_HTTP_SCHEMES = ('http', 'https')
 
 
-def is_same_domain(url: str, base_url: str) -> bool:
-    """Check if URL belongs to the same domain as base URL."""
+@functools.lru_cache(maxsize=100_000)
+def _page_netloc(url: str) -> Optional[str]:
+    """Return the URL's netloc if it is a page URL (not an asset), else None."""
     parsed = urlparse(url)
-    base_parsed = urlparse(base_url)
-    return parsed.netloc == base_parsed.netloc
+    
+    # Must be http/https; checked first since it is the cheapest test
+    if parsed.scheme not in _HTTP_SCHEMES:
+        return None
+    
+    # str.endswith checks the whole tuple in a single call
+    if parsed.path[-_SKIP_TAIL:].lower().endswith(_SKIP_EXTENSIONS):
+        return None
+    return parsed.netloc
 
 
 def is_valid_page_url(url: str) -> bool:
     """Check if URL is a valid page URL (not an asset)."""
-    parsed = urlparse(url)
-    path = parsed.path.lower()
+    return _page_netloc(url) is not None
+
+
+def _filter_link(href: str, current_url: str, base_netloc: str) -> Optional[str]:
+    """Resolve one href to a normalized same-domain page URL, or None to skip it."""
+    normalized = normalize_url(urljoin(current_url, href))
+    # Same parse-once, cached check as is_valid_page_url, plus the host
+    if _page_netloc(normalized) != base_netloc:
+        return None
+    return normalized
+
+
+def filter_and_normalize(hrefs: list[str], current_url: str, base_netloc: str) -> set[str]:
+    """Resolve a page's raw hrefs into normalized same-domain page URLs, parsing each once."""
+    links: set[str] = set()
+    for href in hrefs:
+        if href:
+            link = _filter_link(href, current_url, base_netloc)
+            if link is not None:
+                links.add(link)
+    return links
+
+
+USER_AGENT = "Mozilla/5.0 (compatible; VisualSitemapBot/1.0)"
+
+
+class AnchorParser(HTMLParser):
+    """Collect <a href> values and the <title> text from static HTML."""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs: list[str] = []
+        self.title: str = ""
+        self._in_title = False
     
-    # Skip common non-page extensions
-    skip_extensions = {
-        '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico',
-        '.css', '.js', '.json', '.xml', '.txt', '.pdf', '.doc', '.docx',
-        '.zip', '.tar', '.gz', '.mp3', '.mp4', '.webm', '.woff', '.woff2',
-        '.ttf', '.eot', '.otf'
-    }
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href" and value:
+                    self.hrefs.append(value)
+        elif tag == "title":
+            self._in_title = True
     
-    for ext in skip_extensions:
-        if path.endswith(ext):
-            return False
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
     
-    # Must be http/https
-    return parsed.scheme in ('http', 'https')
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+
+
+# Only anchors matter, so skip downloading resources that cannot contain them
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+
+
+async def block_heavy_resources(route: Route):
+    """Playwright route handler that aborts image, media, font and stylesheet requests."""
+    if route.request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+# URLState.status values
+SEEN = "seen"  # linked to, but beyond max_depth so never queued
+QUEUED = "queued"
+VISITED = "visited"
+FAILED = "failed"
+
+
+@dataclass(slots=True)
+class URLState:
+    """Everything the crawler tracks about one URL."""
+    url: str
+    index: int  # position in SitemapCrawler._by_index, used in edges
+    depth: int
+    status: str
+    incoming: int = 0
+    node: Optional[PageNode] = None
+    # This page's outgoing links are edges[edge_start:edge_end], appended in one go
+    edge_start: int = 0
+    edge_end: int = 0
 
 
 class SitemapCrawler:
@@ -63,76 +163,150 @@ class SitemapCrawler:
         self,
         max_pages: int = settings.MAX_PAGES,
         max_depth: int = settings.MAX_DEPTH,
-        timeout_per_page: int = settings.CRAWL_TIMEOUT
+        timeout_per_page: int = settings.CRAWL_TIMEOUT,
+        traversal: Optional[str] = None,
+        concurrency: int = settings.CRAWL_CONCURRENCY,
+        per_host_concurrency: int = settings.CRAWL_PER_HOST_CONCURRENCY,
+        min_delay: float = settings.CRAWL_MIN_DELAY,
+        static_fetch: bool = settings.CRAWL_STATIC_FETCH,
+        browser_service: Optional[BrowserService] = None
     ):
         self.max_pages = max_pages
         self.max_depth = max_depth
         self.timeout_per_page = timeout_per_page
+        # BFS fills a max_pages budget with the top levels of the site. DFS is
+        # opt-in: its frontier stays around depth x branching, but a capped crawl
+        # returns one deep branch; reach() corrects depths when a shorter path
+        # turns up later
+        self.traversal = traversal or "bfs"
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.min_delay = min_delay
+        self.static_fetch = static_fetch
+        self.browser_service = browser_service
         self.browser: Optional[Browser] = None
+        self._http: Optional[httpx.AsyncClient] = None
         
         # Crawl state
-        self.visited: dict[str, PageNode] = {}
-        self.links: list[tuple[str, str]] = []
-        self.queue: list[tuple[str, int]] = []  # (url, depth)
-        self.incoming_count: dict[str, int] = defaultdict(int)
+        # One entry per URL seen; status tells queued, visited and failed apart
+        self.state: dict[str, URLState] = {}
+        self._by_index: list[URLState] = []
+        self.queue: asyncio.Queue[str] = self._new_queue()  # URLs pending work
+        self.pages_crawled = 0
+        self.edges = array("I")  # flattened (source, target) URL indexes
         self.base_url: str = ""
+        self._base_netloc: str = ""
+        self._in_flight = 0  # pages being crawled, counted against max_pages
+        self._page_settled = asyncio.Condition()  # notified whenever an in-flight page finishes
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+        self._next_allowed: dict[str, float] = {}  # host -> earliest next request time
+        self._static_fallbacks: dict[str, int] = {}  # host -> static fetches that needed the browser
         
         # Progress tracking
         self.status = CrawlStatus.PENDING
         self.current_url: Optional[str] = None
     
+    def _new_queue(self) -> asyncio.Queue:
+        """DFS pops the most recently found URL; BFS the oldest."""
+        return asyncio.LifoQueue() if self.traversal == "dfs" else asyncio.Queue()
+    
+    def add_url(self, url: str, depth: int, status: str) -> URLState:
+        """Start tracking a URL and give it the next integer index."""
+        state = self.state[url] = URLState(url=url, index=len(self._by_index), depth=depth, status=status)
+        self._by_index.append(state)
+        return state
+    
+    def nodes(self) -> list[PageNode]:
+        """Return the nodes of all successfully crawled pages."""
+        return [state.node for state in self._by_index if state.node is not None]
+    
     def get_progress(self) -> CrawlProgress:
         """Get current crawl progress."""
-        total = len(self.visited) + len(self.queue)
-        progress = (len(self.visited) / max(total, 1)) * 100
+        total = self.pages_crawled + self.queue.qsize()
+        progress = (self.pages_crawled / max(total, 1)) * 100
         return CrawlProgress(
             status=self.status,
-            pages_crawled=len(self.visited),
-            pages_queued=len(self.queue),
+            pages_crawled=self.pages_crawled,
+            pages_queued=self.queue.qsize(),
             current_url=self.current_url,
             progress_percent=round(progress, 1)
         )
     
-    async def extract_links(self, page: Page, current_url: str) -> list[str]:
+    async def extract_links(self, page: Page, current_url: str) -> set[str]:
         """Extract all valid links from a page."""
-        links = []
         try:
-            elements = await page.query_selector_all("a[href]")
-            for element in elements:
-                href = await element.get_attribute("href")
-                if not href:
-                    continue
-                
-                # Resolve relative URLs
-                absolute_url = urljoin(current_url, href)
-                normalized = normalize_url(absolute_url)
-                
-                # Filter: same domain and valid page URL
-                if is_same_domain(normalized, self.base_url) and is_valid_page_url(normalized):
-                    links.append(normalized)
+            # One browser round-trip for all hrefs instead of one per anchor
+            hrefs: list[str] = await page.eval_on_selector_all(
+                "a[href]", "els => els.map(e => e.getAttribute('href'))"
+            )
         except Exception:
-            pass
+            return set()
         
-        return list(set(links))  # Dedupe
+        return filter_and_normalize(hrefs, current_url, self._base_netloc)
     
-    async def crawl_page(self, page: Page, url: str, depth: int) -> Optional[PageNode]:
-        """Crawl a single page and extract info."""
-        if url in self.visited:
+    async def fetch_static(self, url: str) -> Optional[tuple[str, set[str]]]:
+        """
+        Try to read a page's title and links with a plain HTTP request.
+        Returns None when the page needs a real browser.
+        """
+        if self._http is None:
+            return None
+        
+        try:
+            response = await self._http.get(url)
+        except httpx.HTTPError:
+            return None
+        
+        if response.status_code != 200 or "text/html" not in response.headers.get("content-type", ""):
+            return None
+        
+        parser = AnchorParser()
+        try:
+            parser.feed(response.text)
+            parser.close()
+        except Exception:
             return None
         
+        # Very few anchors usually means a JS app shell that renders links client-side
+        if len(parser.hrefs) < settings.STATIC_MIN_ANCHORS:
+            return None
+        
+        return parser.title.strip(), filter_and_normalize(parser.hrefs, url, self._base_netloc)
+    
+    async def crawl_page(self, page: Page, url: str, depth: int) -> Optional[PageNode]:
+        """Crawl a single page and extract info."""
+        state = self.state[url]
         self.current_url = url
         
         try:
-            response = await page.goto(url, wait_until="domcontentloaded", timeout=self.timeout_per_page)
+            # Static HTML fast path; fall back to the browser for JS-rendered pages
+            static = None
+            host = urlparse(url).netloc
+            if self._http is not None and self._static_fallbacks.get(host, 0) < settings.STATIC_MAX_FALLBACKS:
+                static = await self.fetch_static(url)
+                if static is None:
+                    # Mostly JS-rendered hosts (SPAs) stop paying for the double fetch
+                    self._static_fallbacks[host] = self._static_fallbacks.get(host, 0) + 1
+                    # The HTTP request used this host's slot; the browser load needs its own
+                    await self._wait_for_host(host)
             
-            if not response or response.status >= 400:
-                return None
-            
-            # Get page title
-            title = await page.title()
+            if static is not None:
+                title, links = static
+            else:
+                response = await page.goto(url, wait_until="domcontentloaded", timeout=self.timeout_per_page)
+                
+                if not response or response.status >= 400:
+                    state.status = FAILED
+                    return None
+                
+                # Get page title
+                title = await page.title()
+                
+                # Extract links
+                links = await self.extract_links(page, url)
             
-            # Extract links
-            links = await self.extract_links(page, url)
+            # A shorter path may have been found while the page was loading
+            depth = min(depth, state.depth)
             
             # Create node
             node = PageNode(
@@ -144,85 +318,181 @@ class SitemapCrawler:
                 incoming_links=0  # Will be updated later
             )
             
-            self.visited[url] = node
+            state.node = node
+            state.status = VISITED
+            self.pages_crawled += 1
             
             # Add links to queue and track
+            state.edge_start = len(self.edges)
+            targets = []
             for link_url in links:
-                # Track link
-                self.links.append((url, link_url))
-                self.incoming_count[link_url] += 1
+                target = self.state.get(link_url)
+                if target is None:
+                    target = self.add_url(link_url, depth + 1, SEEN)
                 
-                # Add to queue if not visited and within depth
-                if link_url not in self.visited and depth + 1 <= self.max_depth:
-                    if not any(q[0] == link_url for q in self.queue):
-                        self.queue.append((link_url, depth + 1))
+                # Track link
+                target.incoming += 1
+                self.edges.append(state.index)
+                self.edges.append(target.index)
+                targets.append(target)
+            state.edge_end = len(self.edges)
+            
+            for target in targets:
+                self.reach(target, depth + 1)
             
             return node
             
         except PlaywrightTimeout:
+            state.status = FAILED
             return None
         except Exception:
+            state.status = FAILED
             return None
     
+    def reach(self, target: URLState, depth: int):
+        """
+        Record that target is reachable at depth: queue it the first time it is
+        within max_depth, and propagate shorter paths found later (DFS can find
+        a deep path before a shallow one) through already-crawled pages.
+        """
+        pending = [(target, depth)]
+        while pending:
+            state, depth = pending.pop()
+            if state.status == SEEN:
+                state.depth = min(state.depth, depth)
+                if depth <= self.max_depth:
+                    state.status = QUEUED
+                    self.queue.put_nowait(state.url)
+            elif depth < state.depth:
+                # Queued pages pick up the new depth when they are crawled
+                state.depth = depth
+                if state.status == VISITED:
+                    state.node.depth = depth
+                    # Children beyond the old depth limit may now be in range
+                    for i in range(state.edge_start + 1, state.edge_end, 2):
+                        pending.append((self._by_index[self.edges[i]], depth + 1))
+    
+    async def _wait_for_host(self, host: str):
+        """Space requests to one host at least min_delay apart."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        # Reserve the next slot before sleeping so concurrent workers queue up behind it
+        slot = max(now, self._next_allowed.get(host, 0.0))
+        self._next_allowed[host] = slot + self.min_delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+    
+    async def _worker(self, page: Page):
+        """Pull URLs off the shared queue and crawl them with this worker's page."""
+        while True:
+            item = await self.queue.get()
+            try:
+                if item is None:
+                    return
+                url = item
+                
+                # Each URL is queued exactly once (seen -> queued), so no visited check is needed.
+                # When in-flight pages fill the remaining budget, wait for them rather than
+                # dropping the URL: any of them may still fail and free its slot.
+                if self.pages_crawled + self._in_flight >= self.max_pages:
+                    async with self._page_settled:
+                        await self._page_settled.wait_for(
+                            lambda: self.pages_crawled + self._in_flight < self.max_pages
+                            or self.pages_crawled >= self.max_pages
+                        )
+                if self.pages_crawled >= self.max_pages:
+                    continue
+                
+                host = urlparse(url).netloc
+                slots = self._host_slots.get(host)
+                if slots is None:
+                    slots = self._host_slots[host] = asyncio.Semaphore(self.per_host_concurrency)
+                
+                self._in_flight += 1
+                try:
+                    async with slots:
+                        await self._wait_for_host(host)
+                        await self.crawl_page(page, url, self.state[url].depth)
+                finally:
+                    self._in_flight -= 1
+                    async with self._page_settled:
+                        self._page_settled.notify_all()
+            finally:
+                self.queue.task_done()
+    
+    async def _crawl_with_context(self, context: BrowserContext):
+        """Run the worker pool on pages from the given browser context."""
+        await context.route("**/*", block_heavy_resources)
+        pages = [await context.new_page() for _ in range(self.concurrency)]
+        workers = [asyncio.create_task(self._worker(page)) for page in pages]
+        
+        try:
+            # Workers re-fill the queue as they go; join() returns once
+            # every queued URL has been crawled or skipped
+            await self.queue.join()
+        finally:
+            for _ in workers:
+                self.queue.put_nowait(None)
+            await asyncio.gather(*workers)
+    
     async def crawl(self, start_url: str) -> SitemapResult:
         """Perform the complete crawl starting from start_url."""
         start_time = time.time()
         self.base_url = normalize_url(start_url)
+        self._base_netloc = urlparse(self.base_url).netloc
         self.status = CrawlStatus.CRAWLING
         
         # Reset state
-        self.visited.clear()
-        self.links.clear()
-        self.queue.clear()
-        self.incoming_count.clear()
+        self.state.clear()
+        self._by_index.clear()
+        self.pages_crawled = 0
+        self.edges = array("I")
+        self.queue = self._new_queue()
+        self._in_flight = 0
+        self._page_settled = asyncio.Condition()
+        self._host_slots.clear()
+        self._next_allowed.clear()
+        self._static_fallbacks.clear()
         
         # Add start URL to queue
-        self.queue.append((self.base_url, 0))
+        self.add_url(self.base_url, 0, QUEUED)
+        self.queue.put_nowait(self.base_url)
         
         try:
-            async with async_playwright() as p:
-                self.browser = await p.chromium.launch(headless=True)
-                context = await self.browser.new_context(
-                    user_agent="Mozilla/5.0 (compatible; VisualSitemapBot/1.0)"
+            if self.static_fetch:
+                self._http = httpx.AsyncClient(
+                    headers={"User-Agent": USER_AGENT},
+                    follow_redirects=True,
+                    timeout=self.timeout_per_page / 1000,
                 )
-                page = await context.new_page()
-                
-                while self.queue and len(self.visited) < self.max_pages:
-                    url, depth = self.queue.pop(0)
-                    
-                    if url in self.visited:
-                        continue
-                    
-                    await self.crawl_page(page, url, depth)
-                    
-                    # Small delay to be polite
-                    await asyncio.sleep(0.1)
-                
-                await self.browser.close()
             
-            # Update incoming link counts
-            for url, node in self.visited.items():
-                node.incoming_links = self.incoming_count.get(url, 0)
+            if self.browser_service is not None and self.browser_service.is_running:
+                # Reuse the app-wide browser; only the context is per crawl
+                context = await self.browser_service.new_context(user_agent=USER_AGENT)
+                try:
+                    await self._crawl_with_context(context)
+                finally:
+                    await context.close()
+            else:
+                async with async_playwright() as p:
+                    self.browser = await p.chromium.launch(headless=True)
+                    context = await self.browser.new_context(user_agent=USER_AGENT)
+                    await self._crawl_with_context(context)
+                    await self.browser.close()
             
             # Build result
-            nodes = list(self.visited.values())
-            page_links = []
-            
-            for source_url, target_url in self.links:
-                if source_url in self.visited and target_url in self.visited:
-                    page_links.append(PageLink(
-                        source=url_to_id(source_url),
-                        target=url_to_id(target_url)
-                    ))
+            nodes = self.nodes()
+            for state in self._by_index:
+                if state.node is not None:
+                    state.node.incoming_links = state.incoming
             
-            # Dedupe links
-            seen_links = set()
-            unique_links = []
-            for link in page_links:
-                key = (link.source, link.target)
-                if key not in seen_links:
-                    seen_links.add(key)
-                    unique_links.append(link)
+            # Sources are always crawled pages; keep links whose target was crawled too
+            by_index = self._by_index
+            unique_links = [
+                PageLink(source=by_index[source].node.id, target=by_index[target].node.id)
+                for source, target in zip(self.edges[0::2], self.edges[1::2])
+                if by_index[target].node is not None
+            ]
             
             self.status = CrawlStatus.COMPLETED
             
@@ -241,10 +511,14 @@ class SitemapCrawler:
             return SitemapResult(
                 status=CrawlStatus.FAILED,
                 root_url=self.base_url,
-                total_pages=len(self.visited),
+                total_pages=self.pages_crawled,
                 total_links=0,
-                nodes=list(self.visited.values()),
+                nodes=self.nodes(),
                 links=[],
                 crawl_time_seconds=round(time.time() - start_time, 2),
                 error=str(e)
             )
+        finally:
+            if self._http is not None:
+                await self._http.aclose()
+                self._http = None
@@ -0,0 +1,112 @@
+"""Lightweight async stand-ins for the Playwright objects the crawler uses."""
+import asyncio
+from types import SimpleNamespace
+from typing import Optional
+
+
+def aret(value):
+    """Return a coroutine function that ignores its arguments and returns value."""
+    async def f(*args, **kwargs):
+        return value
+    return f
+
+
+class FakePage:
+    """
+    Page that answers every goto with the same status and title. Hrefs come
+    from site[url] for the last URL visited when site is given, else links.
+    """
+    
+    def __init__(
+        self,
+        links: Optional[list[str]] = None,
+        status: int = 200,
+        title: str = "Test Page",
+        raise_on_goto: Optional[BaseException] = None,
+        raise_on_links: Optional[BaseException] = None,
+        site: Optional[dict[str, list[str]]] = None,
+    ):
+        self.links = links if links is not None else []
+        self.site = site
+        self.url: Optional[str] = None
+        self.status = status
+        self._title = title
+        self.raise_on_goto = raise_on_goto
+        self.raise_on_links = raise_on_links
+    
+    async def goto(self, url, **kwargs):
+        # Yield like a real navigation so concurrent workers interleave
+        await asyncio.sleep(0)
+        if self.raise_on_goto:
+            raise self.raise_on_goto
+        self.url = url
+        return SimpleNamespace(status=self.status)
+    
+    async def title(self):
+        return self._title
+    
+    async def eval_on_selector_all(self, selector, expression):
+        if self.raise_on_links:
+            raise self.raise_on_links
+        if self.site is not None:
+            return self.site.get(self.url, [])
+        return self.links
+
+
+class FakeContext:
+    """Browser context whose pages are all the same FakePage."""
+    
+    def __init__(self, page: FakePage):
+        self.page = page
+        self.closed = False
+    
+    async def route(self, url, handler):
+        pass
+    
+    async def new_page(self):
+        return self.page
+    
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, context: FakeContext):
+        self.context = context
+    
+    async def new_context(self, **kwargs):
+        return self.context
+    
+    async def close(self):
+        pass
+
+
+class FakeChromium:
+    def __init__(self, browser: FakeBrowser, raise_on_launch: Optional[BaseException] = None):
+        self.browser = browser
+        self.raise_on_launch = raise_on_launch
+    
+    async def launch(self, **kwargs):
+        if self.raise_on_launch:
+            raise self.raise_on_launch
+        return self.browser
+
+
+class FakePlaywrightCM:
+    """What async_playwright() returns: an async context manager yielding .chromium."""
+    
+    def __init__(self, chromium: FakeChromium):
+        self.chromium = chromium
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return None
+
+
+def make_playwright(page: Optional[FakePage] = None, **page_overrides) -> FakePlaywrightCM:
+    """Build the whole fake tower around one page (a FakePage(**page_overrides) by default)."""
+    if page is None:
+        page = FakePage(**page_overrides)
+    return FakePlaywrightCM(FakeChromium(FakeBrowser(FakeContext(page))))
@@ -1,14 +1,42 @@
+import importlib.util
+import sys
+import types
+
+if importlib.util.find_spec("playwright") is None:
+    # The suite never drives a real browser; let the app import without the
+    # playwright package by stubbing the few names it pulls in
+    _stub = types.ModuleType("playwright.async_api")
+
+    class _PlaywrightTimeout(Exception):
+        pass
+
+    class _Route:
+        request = None
+
+        async def abort(self, error_code=None):
+            pass
+
+        async def continue_(self, **kwargs):
+            pass
+
+    _stub.TimeoutError = _PlaywrightTimeout
+    _stub.Route = _Route
+    _stub.Browser = _stub.BrowserContext = _stub.Page = _stub.Playwright = object
+    _stub.async_playwright = lambda: None
+    sys.modules.setdefault("playwright", types.ModuleType("playwright"))
+    sys.modules.setdefault("playwright.async_api", _stub)
+
 import pytest
+from dataclasses import dataclass
 from httpx import AsyncClient, ASGITransport
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.main import app
+from app.core.database import Base, get_db
 from app.schemas.sitemap import PageNode, PageLink, SitemapResult, CrawlStatus
-
-
-@pytest.fixture
-def anyio_backend():
-    return 'asyncio'
+from tests._fakes import FakePage, FakeContext, FakeBrowser, FakeChromium, make_playwright
 
 
 @pytest.fixture
@@ -18,6 +46,30 @@ async def client():
         yield ac
 
 
+@pytest.fixture
+async def db_session():
+    """In-memory database wired into the app's get_db dependency."""
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+            await session.commit()
+
+    app.dependency_overrides[get_db] = override_get_db
+    async with session_maker() as session:
+        yield session
+    app.dependency_overrides.pop(get_db, None)
+    await engine.dispose()
+
+
 @pytest.fixture
 def mock_sitemap_result():
     """Sample sitemap result for testing."""
@@ -77,3 +129,34 @@ def mock_crawler(mock_sitemap_result):
             "progress_percent": 100.0
         }
         yield MockCrawler
+
+
+@dataclass
+class MockStack:
+    """Handles on each layer of the fake Playwright object tower."""
+    page: FakePage
+    context: FakeContext
+    browser: FakeBrowser
+    chromium: FakeChromium
+    playwright: MagicMock
+
+
+@pytest.fixture(scope="module")
+def patched_async_playwright():
+    """Patch async_playwright once per test module instead of once per test."""
+    patcher = patch('app.services.crawler.async_playwright')
+    mock_playwright = patcher.start()
+    yield mock_playwright
+    patcher.stop()
+
+
+@pytest.fixture
+def playwright_mock(patched_async_playwright):
+    """Point the patched async_playwright at fakes serving one 200 page with no links."""
+    patched_async_playwright.reset_mock(return_value=True, side_effect=True)
+    
+    playwright = patched_async_playwright.return_value = make_playwright()
+    chromium = playwright.chromium
+    browser = chromium.browser
+    context = browser.context
+    return MockStack(context.page, context, browser, chromium, patched_async_playwright)
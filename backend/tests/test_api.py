@@ -1,8 +1,10 @@
 import pytest
 from httpx import AsyncClient
+from unittest.mock import AsyncMock, patch
+
+from app.main import app, lifespan
 
 
-@pytest.mark.anyio
 async def test_root(client: AsyncClient):
     """Test root endpoint."""
     response = await client.get("/")
@@ -12,7 +14,6 @@ async def test_root(client: AsyncClient):
     assert "version" in data
 
 
-@pytest.mark.anyio
 async def test_health(client: AsyncClient):
     """Test health endpoint."""
     response = await client.get("/health")
@@ -20,7 +21,28 @@ async def test_health(client: AsyncClient):
     assert response.json() == {"status": "healthy"}
 
 
-@pytest.mark.anyio
+async def test_startup_survives_browser_launch_failure():
+    """A Chromium launch failure is logged instead of stopping the app."""
+    with patch('app.main.init_db', AsyncMock()), \
+            patch('app.main.browser_service.start', AsyncMock(side_effect=RuntimeError("no chromium"))), \
+            patch('app.main.browser_service.stop', AsyncMock()):
+        async with lifespan(app):
+            assert app.state.creem_client is not None
+
+
+async def test_shutdown_runs_every_cleanup():
+    """A failing cleanup does not stop the browser from being shut down."""
+    stop = AsyncMock()
+    with patch('app.main.init_db', AsyncMock()), \
+            patch('app.main.browser_service.start', AsyncMock()), \
+            patch('app.main.browser_service.stop', stop), \
+            patch('app.main.crawl_store.close', AsyncMock(side_effect=RuntimeError("redis"))):
+        with pytest.raises(RuntimeError):
+            async with lifespan(app):
+                pass
+    stop.assert_awaited_once()
+
+
 async def test_crawl_sync_valid_url(client: AsyncClient, mock_crawler):
     """Test sync crawl with valid URL."""
     response = await client.post(
@@ -36,7 +58,6 @@ async def test_crawl_sync_valid_url(client: AsyncClient, mock_crawler):
     assert len(data["links"]) == 2
 
 
-@pytest.mark.anyio
 async def test_crawl_sync_invalid_url(client: AsyncClient):
     """Test sync crawl with invalid URL."""
     response = await client.post(
@@ -46,7 +67,6 @@ async def test_crawl_sync_invalid_url(client: AsyncClient):
     assert response.status_code == 422
 
 
-@pytest.mark.anyio
 async def test_crawl_sync_missing_url(client: AsyncClient):
     """Test sync crawl without URL."""
     response = await client.post(
@@ -56,7 +76,6 @@ async def test_crawl_sync_missing_url(client: AsyncClient):
     assert response.status_code == 422
 
 
-@pytest.mark.anyio
 async def test_crawl_sync_invalid_depth(client: AsyncClient):
     """Test sync crawl with invalid depth."""
     response = await client.post(
@@ -66,7 +85,6 @@ async def test_crawl_sync_invalid_depth(client: AsyncClient):
     assert response.status_code == 422
 
 
-@pytest.mark.anyio
 async def test_crawl_sync_invalid_max_pages(client: AsyncClient):
     """Test sync crawl with invalid max_pages."""
     response = await client.post(
@@ -76,7 +94,6 @@ async def test_crawl_sync_invalid_max_pages(client: AsyncClient):
     assert response.status_code == 422
 
 
-@pytest.mark.anyio
 async def test_crawl_async_start(client: AsyncClient, mock_crawler):
     """Test async crawl start."""
     response = await client.post(
@@ -89,31 +106,27 @@ async def test_crawl_async_start(client: AsyncClient, mock_crawler):
     assert data["status"] == "started"
 
 
-@pytest.mark.anyio
 async def test_crawl_progress_not_found(client: AsyncClient):
     """Test progress for non-existent crawl."""
     response = await client.get("/api/v1/sitemap/crawl/nonexistent/progress")
     assert response.status_code == 404
 
 
-@pytest.mark.anyio
 async def test_crawl_result_not_found(client: AsyncClient):
     """Test result for non-existent crawl."""
     response = await client.get("/api/v1/sitemap/crawl/nonexistent/result")
     assert response.status_code == 404
 
 
-@pytest.mark.anyio
 async def test_delete_crawl_not_found(client: AsyncClient):
     """Test delete for non-existent crawl."""
     response = await client.delete("/api/v1/sitemap/crawl/nonexistent")
     assert response.status_code == 404
 
 
-@pytest.mark.anyio
 async def test_crawl_async_flow(client: AsyncClient, mock_crawler, mock_sitemap_result):
     """Test the complete async crawl flow."""
-    from app.api.v1 import sitemap
+    from app.services import crawl_store
     
     # Start crawl
     response = await client.post(
@@ -124,8 +137,8 @@ async def test_crawl_async_flow(client: AsyncClient, mock_crawler, mock_sitemap_
     data = response.json()
     crawl_id = data["crawl_id"]
     
-    # Simulate completed crawl by adding to completed_crawls
-    sitemap.completed_crawls[crawl_id] = mock_sitemap_result
+    # Simulate completed crawl by storing its result
+    await crawl_store.put_result(crawl_id, mock_sitemap_result)
     
     # Get progress for completed crawl
     response = await client.get(f"/api/v1/sitemap/crawl/{crawl_id}/progress")
@@ -150,34 +163,32 @@ async def test_crawl_async_flow(client: AsyncClient, mock_crawler, mock_sitemap_
     assert response.status_code == 404
 
 
-@pytest.mark.anyio
 async def test_crawl_result_in_progress(client: AsyncClient):
     """Test getting result when crawl is still in progress."""
-    from app.api.v1 import sitemap
+    from app.services import crawl_store
     from app.services.crawler import SitemapCrawler
     
-    # Directly add a crawler to active_crawls
+    # Directly register an active crawler
     crawl_id = "inprogress123"
-    sitemap.active_crawls[crawl_id] = SitemapCrawler()
+    await crawl_store.put_active(crawl_id, SitemapCrawler())
     
     # Get result should return 202
     response = await client.get(f"/api/v1/sitemap/crawl/{crawl_id}/result")
     assert response.status_code == 202
     
     # Cleanup
-    del sitemap.active_crawls[crawl_id]
+    await crawl_store.drop_active(crawl_id)
 
 
-@pytest.mark.anyio
 async def test_crawl_progress_active(client: AsyncClient, mock_crawler):
     """Test getting progress for active crawl."""
-    from app.api.v1 import sitemap
+    from app.services import crawl_store
     from app.services.crawler import SitemapCrawler
     
-    # Create a crawler and add to active
+    # Create a crawler and register it as active
     crawler = SitemapCrawler()
     crawl_id = "test123"
-    sitemap.active_crawls[crawl_id] = crawler
+    await crawl_store.put_active(crawl_id, crawler)
     
     # Get progress
     response = await client.get(f"/api/v1/sitemap/crawl/{crawl_id}/progress")
@@ -187,4 +198,4 @@ async def test_crawl_progress_active(client: AsyncClient, mock_crawler):
     assert progress["pages_crawled"] == 0
     
     # Cleanup
-    del sitemap.active_crawls[crawl_id]
+    await crawl_store.drop_active(crawl_id)
@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from cachetools import LRUCache
+from unittest.mock import patch
+
+from app.schemas.sitemap import CrawlStatus
+from app.services import crawl_store
+from app.services.crawler import SitemapCrawler
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio calls the store makes."""
+
+    def __init__(self):
+        self.data: dict[str, str] = {}
+        self.ttls: dict[str, int] = {}
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.ttls[key] = ex
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def delete(self, key):
+        return 1 if self.data.pop(key, None) is not None else 0
+
+
+@pytest.fixture
+def fake_redis():
+    redis = FakeRedis()
+    with patch.object(crawl_store, "_get_redis", lambda: redis):
+        yield redis
+
+
+async def test_result_roundtrip(mock_sitemap_result):
+    """Stored results can be read back and deleted once."""
+    await crawl_store.put_result("store1", mock_sitemap_result)
+    assert await crawl_store.get_result("store1") == mock_sitemap_result
+
+    assert await crawl_store.drop_result("store1") is True
+    assert await crawl_store.get_result("store1") is None
+    assert await crawl_store.drop_result("store1") is False
+
+
+async def test_results_are_bounded(mock_sitemap_result):
+    """Oldest results are evicted once the store is full."""
+    with patch.object(crawl_store, "_results", LRUCache(maxsize=2)):
+        for crawl_id in ("a", "b", "c"):
+            await crawl_store.put_result(crawl_id, mock_sitemap_result)
+
+        assert await crawl_store.get_result("a") is None
+        assert await crawl_store.get_result("b") is not None
+        assert await crawl_store.get_result("c") is not None
+
+
+async def test_redis_result_roundtrip(fake_redis, mock_sitemap_result):
+    """With Redis enabled, results go through Redis with the configured TTL."""
+    await crawl_store.put_result("r1", mock_sitemap_result)
+    assert fake_redis.ttls[crawl_store.RESULT_KEY.format("r1")] == crawl_store.settings.CRAWL_RESULT_TTL
+    assert "r1" not in crawl_store._results
+
+    assert await crawl_store.get_result("r1") == mock_sitemap_result
+    assert await crawl_store.drop_result("r1") is True
+    assert await crawl_store.get_result("r1") is None
+
+
+async def test_redis_active_progress_is_refreshed(fake_redis):
+    """Other workers see a running crawl's progress, not the snapshot taken at start."""
+    crawler = SitemapCrawler()
+    await crawl_store.put_active("a1", crawler)
+    # Another worker has no local crawler and reads the Redis snapshot
+    crawl_store._active.pop("a1")
+    assert (await crawl_store.get_active_progress("a1")).pages_crawled == 0
+
+    refresher = asyncio.create_task(crawl_store.refresh_active("a1", crawler, interval=0.01))
+    crawler.status = CrawlStatus.CRAWLING
+    crawler.pages_crawled = 7
+    await asyncio.sleep(0.05)
+    refresher.cancel()
+
+    progress = await crawl_store.get_active_progress("a1")
+    assert progress.status == CrawlStatus.CRAWLING
+    assert progress.pages_crawled == 7
+
+    await crawl_store.drop_active("a1")
+    assert await crawl_store.get_active_progress("a1") is None
+
+
+async def test_refresh_active_without_redis_returns():
+    """Without Redis there is no snapshot to refresh."""
+    with patch.object(crawl_store, "_get_redis", lambda: None):
+        await asyncio.wait_for(crawl_store.refresh_active("x", SitemapCrawler(), interval=0.01), 1)
+
+
+async def test_refresh_active_survives_redis_errors(fake_redis):
+    """A failing snapshot write is logged and the refresher keeps running."""
+    async def failing_set(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    fake_redis.set = failing_set
+    refresher = asyncio.create_task(crawl_store.refresh_active("e1", SitemapCrawler(), interval=0.01))
+    await asyncio.sleep(0.05)
+    assert not refresher.done()
+    refresher.cancel()
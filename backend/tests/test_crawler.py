@@ -1,12 +1,24 @@
+import asyncio
+import httpx
 import pytest
+from unittest.mock import AsyncMock
+from playwright.async_api import Route
 from app.services.crawler import (
     url_to_id,
     normalize_url,
-    is_same_domain,
     is_valid_page_url,
-    SitemapCrawler
+    filter_and_normalize,
+    _filter_link,
+    block_heavy_resources,
+    AnchorParser,
+    SitemapCrawler,
+    SEEN,
+    QUEUED,
+    VISITED,
 )
+from app.core.config import settings
 from app.schemas.sitemap import CrawlStatus
+from tests._fakes import FakePage
 
 
 class TestUrlHelpers:
@@ -43,27 +55,6 @@ class TestUrlHelpers:
         url = "https://example.com/page?id=123"
         normalized = normalize_url(url)
         assert normalized == "https://example.com/page?id=123"
-    
-    def test_is_same_domain_true(self):
-        """Same domain should return True."""
-        assert is_same_domain(
-            "https://example.com/page",
-            "https://example.com"
-        ) is True
-    
-    def test_is_same_domain_with_subdomain_false(self):
-        """Different subdomains should return False."""
-        assert is_same_domain(
-            "https://sub.example.com/page",
-            "https://example.com"
-        ) is False
-    
-    def test_is_same_domain_different_domain_false(self):
-        """Different domains should return False."""
-        assert is_same_domain(
-            "https://other.com/page",
-            "https://example.com"
-        ) is False
 
 
 class TestIsValidPageUrl:
@@ -100,6 +91,132 @@ class TestIsValidPageUrl:
         assert is_valid_page_url("https://example.com/font.woff2") is False
 
 
+class TestFilterAndNormalize:
+    """Tests for per-page link filtering."""
+    
+    def test_filters_and_normalizes(self):
+        hrefs = [
+            "/about/", "contact#team", "https://example.com/a?x=1",
+            "https://other.com/page", "/logo.PNG", "mailto:hi@example.com", "",
+        ]
+        links = filter_and_normalize(hrefs, "https://example.com/docs/", "example.com")
+        assert links == {
+            "https://example.com/about",
+            "https://example.com/docs/contact",
+            "https://example.com/a?x=1",
+        }
+    
+    @pytest.mark.parametrize("href", [
+        "ftp://example.com/file", "https://other.com/", "https://sub.example.com/page", "/report.pdf",
+        "/doc.Pdf", "/Photo.Jpg",
+    ])
+    def test_filter_link_rejects(self, href):
+        assert _filter_link(href, "https://example.com/", "example.com") is None
+    
+    def test_filter_link_accepts(self):
+        assert _filter_link("../b/?q=1#top", "https://example.com/a/x", "example.com") == "https://example.com/b/?q=1"
+
+
+class TestBlockHeavyResources:
+    """Tests for the resource-blocking route handler."""
+    
+    @pytest.mark.parametrize("resource_type", ["image", "media", "font", "stylesheet"])
+    async def test_blocks_heavy_resources(self, resource_type):
+        route = AsyncMock(spec_set=Route)
+        route.request.resource_type = resource_type
+        await block_heavy_resources(route)
+        route.abort.assert_awaited_once()
+        route.continue_.assert_not_called()
+    
+    @pytest.mark.parametrize("resource_type", ["document", "script", "xhr", "fetch"])
+    async def test_allows_page_resources(self, resource_type):
+        route = AsyncMock(spec_set=Route)
+        route.request.resource_type = resource_type
+        await block_heavy_resources(route)
+        route.continue_.assert_awaited_once()
+        route.abort.assert_not_called()
+
+
+STATIC_HTML = """
+<html><head><title> Home </title></head><body>
+<a href="/about">About</a><a href="/contact#form">Contact</a>
+<a href="/logo.png">Logo</a><a href="https://other.com/">Other</a>
+<a href="/blog/">Blog</a><a>No href</a>
+</body></html>
+"""
+
+
+def _static_crawler(handler) -> SitemapCrawler:
+    crawler = SitemapCrawler()
+    crawler._base_netloc = "example.com"
+    crawler._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return crawler
+
+
+class TestStaticFetch:
+    """Tests for the plain-HTTP fast path."""
+    
+    def test_anchor_parser(self):
+        parser = AnchorParser()
+        parser.feed(STATIC_HTML)
+        assert parser.title.strip() == "Home"
+        assert parser.hrefs == [
+            "/about", "/contact#form", "/logo.png", "https://other.com/", "/blog/"
+        ]
+    
+    async def test_static_page(self):
+        crawler = _static_crawler(
+            lambda request: httpx.Response(200, html=STATIC_HTML)
+        )
+        title, links = await crawler.fetch_static("https://example.com")
+        assert title == "Home"
+        assert links == {
+            "https://example.com/about",
+            "https://example.com/contact",
+            "https://example.com/blog",
+        }
+    
+    async def test_app_shell_falls_back(self):
+        """Pages with almost no anchors are left to the browser."""
+        crawler = _static_crawler(
+            lambda request: httpx.Response(200, html='<div id="root"></div><a href="/x">x</a>')
+        )
+        assert await crawler.fetch_static("https://example.com") is None
+    
+    async def test_non_html_falls_back(self):
+        crawler = _static_crawler(lambda request: httpx.Response(200, json={}))
+        assert await crawler.fetch_static("https://example.com") is None
+    
+    async def test_error_status_falls_back(self):
+        crawler = _static_crawler(lambda request: httpx.Response(403, html=STATIC_HTML))
+        assert await crawler.fetch_static("https://example.com") is None
+    
+    async def test_disabled_without_client(self):
+        assert await SitemapCrawler().fetch_static("https://example.com") is None
+    
+    async def test_browser_fallback_waits_again_then_stops_static(self):
+        """Each fallback takes a second politeness slot; repeated fallbacks disable the static path."""
+        requests = []
+        
+        def handler(request):
+            requests.append(request.url)
+            return httpx.Response(200, html='<div id="root"></div>')
+        
+        crawler = _static_crawler(handler)
+        crawler.min_delay = 0
+        waits = []
+        crawler._wait_for_host = AsyncMock(side_effect=waits.append)
+        page = FakePage()
+        
+        for i in range(settings.STATIC_MAX_FALLBACKS + 2):
+            url = f"https://example.com/p{i}"
+            crawler.add_url(url, 1, QUEUED)
+            await crawler.crawl_page(page, url, 1)
+        
+        assert len(requests) == settings.STATIC_MAX_FALLBACKS
+        assert len(waits) == settings.STATIC_MAX_FALLBACKS
+
+
 class TestSitemapCrawler:
     """Tests for SitemapCrawler class."""
     
@@ -116,6 +233,23 @@ class TestSitemapCrawler:
         assert crawler.max_pages == 50
         assert crawler.max_depth == 2
     
+    def test_crawler_traversal_default(self):
+        """Crawls default to BFS; DFS is opt-in."""
+        assert SitemapCrawler(max_depth=3).traversal == "bfs"
+        assert SitemapCrawler(max_depth=5).traversal == "bfs"
+        assert SitemapCrawler(max_depth=5, traversal="dfs").traversal == "dfs"
+    
+    async def test_wait_for_host_spaces_requests(self):
+        """Back-to-back requests to one host are spaced by min_delay; other hosts are not."""
+        crawler = SitemapCrawler(min_delay=0.05)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await crawler._wait_for_host("example.com")
+        await crawler._wait_for_host("other.com")
+        assert loop.time() - start < 0.05
+        await crawler._wait_for_host("example.com")
+        assert loop.time() - start >= 0.05
+    
     def test_get_progress_initial(self):
         """Test initial progress state."""
         crawler = SitemapCrawler()
@@ -125,20 +259,60 @@ class TestSitemapCrawler:
         assert progress.pages_queued == 0
         assert progress.progress_percent == 0.0
     
+    async def test_crawl_page_tracks_state(self):
+        """Linked URLs are tracked once, counted as incoming and queued only within depth."""
+        crawler = SitemapCrawler(max_depth=1, static_fetch=False)
+        crawler._base_netloc = "example.com"
+        crawler.add_url("https://example.com", 0, QUEUED)
+        crawler.add_url("https://example.com/deep", 2, SEEN)
+        page = FakePage(links=["/a", "/deep"], title="Home")
+        
+        node = await crawler.crawl_page(page, "https://example.com", 0)
+        
+        assert crawler.state["https://example.com"].node is node
+        assert crawler.state["https://example.com"].status == VISITED
+        assert crawler.state["https://example.com/a"].incoming == 1
+        assert crawler.state["https://example.com/deep"].status == QUEUED
+        assert crawler.state["https://example.com/deep"].depth == 1
+        assert crawler.queue.qsize() == 2
+    
+    async def test_shorter_path_lowers_visited_depth(self):
+        """A page first crawled via a long path is re-expanded when a shorter one turns up."""
+        site = {
+            "https://example.com": ["/a", "/b"],
+            "https://example.com/a": ["/a1"],
+            "https://example.com/a1": ["/c"],
+            "https://example.com/b": ["/c"],
+            "https://example.com/c": ["/c1"],
+        }
+        crawler = SitemapCrawler(max_depth=3, static_fetch=False)
+        crawler._base_netloc = "example.com"
+        crawler.add_url("https://example.com", 0, QUEUED)
+        page = FakePage(site=site)
+        
+        # Worst DFS order: the long path through /a reaches /c before /b does
+        for path in ("", "/a", "/a1", "/c"):
+            url = "https://example.com" + path
+            await page.goto(url)
+            await crawler.crawl_page(page, url, crawler.state[url].depth)
+        assert crawler.state["https://example.com/c1"].status == SEEN
+        
+        await page.goto("https://example.com/b")
+        await crawler.crawl_page(page, "https://example.com/b", 1)
+        
+        assert crawler.state["https://example.com/c"].node.depth == 2
+        assert crawler.state["https://example.com/c1"].status == QUEUED
+        assert crawler.state["https://example.com/c1"].depth == 3
+    
     def test_get_progress_with_data(self):
         """Test progress with some crawled pages."""
         crawler = SitemapCrawler()
         # Simulate some crawling
-        from app.schemas.sitemap import PageNode
-        crawler.visited["https://example.com"] = PageNode(
-            id="abc", url="https://example.com", title="Home", depth=0,
-            outgoing_links=2, incoming_links=0
-        )
-        crawler.visited["https://example.com/about"] = PageNode(
-            id="def", url="https://example.com/about", title="About", depth=1,
-            outgoing_links=1, incoming_links=1
-        )
-        crawler.queue = [("https://example.com/contact", 1)]
+        crawler.add_url("https://example.com", 0, VISITED)
+        crawler.add_url("https://example.com/about", 1, VISITED)
+        crawler.pages_crawled = 2
+        crawler.add_url("https://example.com/contact", 1, QUEUED)
+        crawler.queue.put_nowait("https://example.com/contact")
         crawler.status = CrawlStatus.CRAWLING
         
         progress = crawler.get_progress()
@@ -152,15 +326,11 @@ class TestSitemapCrawler:
         """Test that crawler state is properly reset between crawls."""
         crawler = SitemapCrawler()
         # Add some fake data
-        from app.schemas.sitemap import PageNode
-        crawler.visited["test"] = PageNode(
-            id="abc", url="test", title="Test", depth=0,
-            outgoing_links=0, incoming_links=0
-        )
-        crawler.links = [("a", "b")]
-        crawler.queue = [("url", 1)]
+        crawler.add_url("test", 0, VISITED)
+        crawler.edges.extend((0, 1))
+        crawler.queue.put_nowait("url")
         
         # State should be non-empty
-        assert len(crawler.visited) == 1
-        assert len(crawler.links) == 1
-        assert len(crawler.queue) == 1
+        assert len(crawler.state) == 1
+        assert len(crawler.edges) == 2
+        assert crawler.queue.qsize() == 1
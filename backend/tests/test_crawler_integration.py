@@ -1,242 +1,165 @@
 """Integration tests for the crawler that mock Playwright."""
+import itertools
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from playwright.async_api import TimeoutError as PlaywrightTimeout
+from app.services.browser import BrowserService
 from app.services.crawler import SitemapCrawler
 from app.schemas.sitemap import CrawlStatus
+from tests._fakes import aret
+
+
+def _hrefs(n: int) -> list[str]:
+    """The first n distinct page hrefs."""
+    return list(itertools.islice(map("/page{}".format, itertools.count()), n))
+
+
+@pytest.fixture(autouse=True)
+def no_static_fetch():
+    """Keep crawls on the mocked browser path instead of real HTTP requests."""
+    with patch('app.services.crawler.settings.STATIC_MAX_FALLBACKS', 0):
+        yield
+
+
+def _page_not_found(stack):
+    stack.page.status = 404
+
+
+def _page_timeout(stack):
+    stack.page.raise_on_goto = PlaywrightTimeout("Timeout")
+
+
+def _links_query_fails(stack):
+    stack.page.raise_on_links = Exception("Query failed")
+
+
+def _browser_crash(stack):
+    stack.chromium.raise_on_launch = Exception("Browser crash")
 
 
 class TestCrawlerIntegration:
     """Tests for the full crawl process with mocked Playwright."""
 
-    @pytest.mark.anyio
-    async def test_crawl_success(self):
-        """Test successful crawl with mocked Playwright."""
-        with patch('app.services.crawler.async_playwright') as mock_playwright:
-            # Set up mock browser and page
-            mock_page = AsyncMock()
-            mock_page.title = AsyncMock(return_value="Test Page")
-            mock_page.goto = AsyncMock(return_value=MagicMock(status=200))
-            mock_page.query_selector_all = AsyncMock(return_value=[])
-            
-            mock_context = AsyncMock()
-            mock_context.new_page = AsyncMock(return_value=mock_page)
-            
-            mock_browser = AsyncMock()
-            mock_browser.new_context = AsyncMock(return_value=mock_context)
-            
-            mock_chromium = MagicMock()
-            mock_chromium.launch = AsyncMock(return_value=mock_browser)
-            
-            mock_pw_instance = MagicMock()
-            mock_pw_instance.chromium = mock_chromium
-            
-            mock_playwright.return_value.__aenter__ = AsyncMock(return_value=mock_pw_instance)
-            mock_playwright.return_value.__aexit__ = AsyncMock(return_value=None)
-            
-            crawler = SitemapCrawler(max_pages=5, max_depth=1)
-            result = await crawler.crawl("https://example.com")
-            
-            assert result.status == CrawlStatus.COMPLETED
-            assert result.total_pages >= 1
-            assert result.root_url == "https://example.com"
-            assert result.crawl_time_seconds >= 0
-
-    @pytest.mark.anyio
-    async def test_crawl_with_links(self):
+    @pytest.mark.parametrize("inject,expected_status,expected_pages,error_contains", [
+        pytest.param(None, CrawlStatus.COMPLETED, 1, None, id="success"),
+        # 404 and timed-out pages are skipped
+        pytest.param(_page_not_found, CrawlStatus.COMPLETED, 0, None, id="page_error"),
+        pytest.param(_page_timeout, CrawlStatus.COMPLETED, 0, None, id="timeout"),
+        # The page is still recorded, just with no links
+        pytest.param(_links_query_fails, CrawlStatus.COMPLETED, 1, None, id="extract_links_error"),
+        pytest.param(_browser_crash, CrawlStatus.FAILED, 0, "Browser crash", id="browser_crash"),
+    ])
+    async def test_crawl_outcome(self, playwright_mock, inject, expected_status, expected_pages, error_contains):
+        """Crawls of a single linkless page under injected failures."""
+        if inject is not None:
+            inject(playwright_mock)
+        
+        result = await SitemapCrawler().crawl("https://example.com")
+        
+        assert result.status == expected_status
+        assert result.root_url == "https://example.com"
+        assert result.total_pages == expected_pages
+        assert result.total_links == 0
+        assert result.crawl_time_seconds >= 0
+        if error_contains is None:
+            assert result.error is None
+        else:
+            assert error_contains in result.error
+
+    async def test_crawl_with_links(self, playwright_mock):
         """Test crawl that finds and follows links."""
-        with patch('app.services.crawler.async_playwright') as mock_playwright:
-            # Create mock anchor elements with hrefs
-            mock_link1 = AsyncMock()
-            mock_link1.get_attribute = AsyncMock(return_value="/about")
-            
-            mock_link2 = AsyncMock()
-            mock_link2.get_attribute = AsyncMock(return_value="/contact")
-            
-            mock_link3 = AsyncMock()
-            mock_link3.get_attribute = AsyncMock(return_value="https://external.com")  # External link
-            
-            call_count = [0]
-            
-            async def mock_query_selector_all(selector):
-                call_count[0] += 1
-                if call_count[0] == 1:
-                    return [mock_link1, mock_link2, mock_link3]
-                return []
-            
-            mock_page = AsyncMock()
-            mock_page.title = AsyncMock(return_value="Test Page")
-            mock_page.goto = AsyncMock(return_value=MagicMock(status=200))
-            mock_page.query_selector_all = mock_query_selector_all
-            
-            mock_context = AsyncMock()
-            mock_context.new_page = AsyncMock(return_value=mock_page)
-            
-            mock_browser = AsyncMock()
-            mock_browser.new_context = AsyncMock(return_value=mock_context)
-            
-            mock_chromium = MagicMock()
-            mock_chromium.launch = AsyncMock(return_value=mock_browser)
-            
-            mock_pw_instance = MagicMock()
-            mock_pw_instance.chromium = mock_chromium
-            
-            mock_playwright.return_value.__aenter__ = AsyncMock(return_value=mock_pw_instance)
-            mock_playwright.return_value.__aexit__ = AsyncMock(return_value=None)
-            
-            crawler = SitemapCrawler(max_pages=10, max_depth=2)
-            result = await crawler.crawl("https://example.com")
-            
-            assert result.status == CrawlStatus.COMPLETED
-            # Should have crawled root + /about + /contact (external is ignored)
-            assert result.total_pages == 3
-            assert result.total_links >= 1
-
-    @pytest.mark.anyio
-    async def test_crawl_respects_max_pages(self):
+        call_count = [0]
+        
+        async def mock_eval_on_selector_all(selector, expression):
+            call_count[0] += 1
+            if call_count[0] == 1:
+                # External link is ignored
+                return ["/about", "/contact", "https://external.com"]
+            return []
+        
+        playwright_mock.page.eval_on_selector_all = mock_eval_on_selector_all
+        
+        crawler = SitemapCrawler(max_pages=10, max_depth=2)
+        result = await crawler.crawl("https://example.com")
+        
+        assert result.status == CrawlStatus.COMPLETED
+        # Should have crawled root + /about + /contact (external is ignored)
+        assert result.total_pages == 3
+        assert result.total_links >= 1
+
+    async def test_default_capped_crawl_covers_top_level(self, playwright_mock):
+        """With the default traversal a capped crawl returns the top levels, not one deep branch."""
+        playwright_mock.page.site = {
+            "https://example.com": ["/a", "/b", "/c"],
+            "https://example.com/a": ["/a/1", "/a/2"],
+            "https://example.com/a/1": ["/a/1/x"],
+        }
+        
+        crawler = SitemapCrawler(max_pages=4, max_depth=3, concurrency=1, min_delay=0)
+        result = await crawler.crawl("https://example.com")
+        
+        assert sorted(node.depth for node in result.nodes) == [0, 1, 1, 1]
+
+    @pytest.mark.parametrize("traversal", ["bfs", "dfs"])
+    async def test_crawl_depths_match_shortest_path(self, playwright_mock, traversal):
+        """Both traversals report shortest-path depths and crawl every page within max_depth."""
+        playwright_mock.page.site = {
+            "https://example.com": ["/a", "/b"],
+            "https://example.com/a": ["/a1"],
+            "https://example.com/a1": ["/c"],
+            "https://example.com/b": ["/c"],
+            "https://example.com/c": ["/c1"],
+        }
+        
+        crawler = SitemapCrawler(max_depth=3, traversal=traversal, concurrency=1, min_delay=0)
+        result = await crawler.crawl("https://example.com")
+        
+        depths = {node.url.removeprefix("https://example.com"): node.depth for node in result.nodes}
+        assert depths == {"": 0, "/a": 1, "/b": 1, "/a1": 2, "/c": 2, "/c1": 3}
+
+    async def test_crawl_respects_max_pages(self, playwright_mock):
         """Test that crawl respects max_pages limit."""
-        with patch('app.services.crawler.async_playwright') as mock_playwright:
-            # Create many mock links
-            mock_links = []
-            for i in range(10):
-                link = AsyncMock()
-                link.get_attribute = AsyncMock(return_value=f"/page{i}")
-                mock_links.append(link)
-            
-            mock_page = AsyncMock()
-            mock_page.title = AsyncMock(return_value="Test Page")
-            mock_page.goto = AsyncMock(return_value=MagicMock(status=200))
-            mock_page.query_selector_all = AsyncMock(return_value=mock_links)
-            
-            mock_context = AsyncMock()
-            mock_context.new_page = AsyncMock(return_value=mock_page)
-            
-            mock_browser = AsyncMock()
-            mock_browser.new_context = AsyncMock(return_value=mock_context)
-            
-            mock_chromium = MagicMock()
-            mock_chromium.launch = AsyncMock(return_value=mock_browser)
-            
-            mock_pw_instance = MagicMock()
-            mock_pw_instance.chromium = mock_chromium
-            
-            mock_playwright.return_value.__aenter__ = AsyncMock(return_value=mock_pw_instance)
-            mock_playwright.return_value.__aexit__ = AsyncMock(return_value=None)
-            
-            crawler = SitemapCrawler(max_pages=3, max_depth=5)
-            result = await crawler.crawl("https://example.com")
-            
-            assert result.status == CrawlStatus.COMPLETED
-            assert result.total_pages <= 3
-
-    @pytest.mark.anyio
-    async def test_crawl_page_error(self):
-        """Test crawl handles page errors gracefully."""
-        with patch('app.services.crawler.async_playwright') as mock_playwright:
-            mock_page = AsyncMock()
-            mock_page.title = AsyncMock(return_value="Test Page")
-            mock_page.goto = AsyncMock(return_value=MagicMock(status=404))  # 404 error
-            mock_page.query_selector_all = AsyncMock(return_value=[])
-            
-            mock_context = AsyncMock()
-            mock_context.new_page = AsyncMock(return_value=mock_page)
-            
-            mock_browser = AsyncMock()
-            mock_browser.new_context = AsyncMock(return_value=mock_context)
-            
-            mock_chromium = MagicMock()
-            mock_chromium.launch = AsyncMock(return_value=mock_browser)
-            
-            mock_pw_instance = MagicMock()
-            mock_pw_instance.chromium = mock_chromium
-            
-            mock_playwright.return_value.__aenter__ = AsyncMock(return_value=mock_pw_instance)
-            mock_playwright.return_value.__aexit__ = AsyncMock(return_value=None)
-            
-            crawler = SitemapCrawler()
-            result = await crawler.crawl("https://example.com")
-            
-            # Should complete but with 0 pages (404 pages are skipped)
-            assert result.status == CrawlStatus.COMPLETED
-            assert result.total_pages == 0
-
-    @pytest.mark.anyio
-    async def test_crawl_timeout(self):
-        """Test crawl handles timeout gracefully."""
-        from playwright.async_api import TimeoutError as PlaywrightTimeout
-        
-        with patch('app.services.crawler.async_playwright') as mock_playwright:
-            mock_page = AsyncMock()
-            mock_page.goto = AsyncMock(side_effect=PlaywrightTimeout("Timeout"))
-            
-            mock_context = AsyncMock()
-            mock_context.new_page = AsyncMock(return_value=mock_page)
-            
-            mock_browser = AsyncMock()
-            mock_browser.new_context = AsyncMock(return_value=mock_context)
-            
-            mock_chromium = MagicMock()
-            mock_chromium.launch = AsyncMock(return_value=mock_browser)
-            
-            mock_pw_instance = MagicMock()
-            mock_pw_instance.chromium = mock_chromium
-            
-            mock_playwright.return_value.__aenter__ = AsyncMock(return_value=mock_pw_instance)
-            mock_playwright.return_value.__aexit__ = AsyncMock(return_value=None)
-            
-            crawler = SitemapCrawler()
-            result = await crawler.crawl("https://example.com")
-            
-            assert result.status == CrawlStatus.COMPLETED
-            assert result.total_pages == 0  # Timeout pages are skipped
-
-    @pytest.mark.anyio
-    async def test_crawl_browser_crash(self):
-        """Test crawl handles browser crash gracefully."""
-        with patch('app.services.crawler.async_playwright') as mock_playwright:
-            mock_chromium = MagicMock()
-            mock_chromium.launch = AsyncMock(side_effect=Exception("Browser crash"))
-            
-            mock_pw_instance = MagicMock()
-            mock_pw_instance.chromium = mock_chromium
-            
-            mock_playwright.return_value.__aenter__ = AsyncMock(return_value=mock_pw_instance)
-            mock_playwright.return_value.__aexit__ = AsyncMock(return_value=None)
-            
-            crawler = SitemapCrawler()
-            result = await crawler.crawl("https://example.com")
-            
-            assert result.status == CrawlStatus.FAILED
-            assert result.error is not None
-            assert "Browser crash" in result.error
-
-    @pytest.mark.anyio
-    async def test_extract_links_error(self):
-        """Test that extract_links handles errors gracefully."""
-        with patch('app.services.crawler.async_playwright') as mock_playwright:
-            mock_page = AsyncMock()
-            mock_page.title = AsyncMock(return_value="Test Page")
-            mock_page.goto = AsyncMock(return_value=MagicMock(status=200))
-            mock_page.query_selector_all = AsyncMock(side_effect=Exception("Query failed"))
-            
-            mock_context = AsyncMock()
-            mock_context.new_page = AsyncMock(return_value=mock_page)
-            
-            mock_browser = AsyncMock()
-            mock_browser.new_context = AsyncMock(return_value=mock_context)
-            
-            mock_chromium = MagicMock()
-            mock_chromium.launch = AsyncMock(return_value=mock_browser)
-            
-            mock_pw_instance = MagicMock()
-            mock_pw_instance.chromium = mock_chromium
-            
-            mock_playwright.return_value.__aenter__ = AsyncMock(return_value=mock_pw_instance)
-            mock_playwright.return_value.__aexit__ = AsyncMock(return_value=None)
-            
-            crawler = SitemapCrawler()
-            result = await crawler.crawl("https://example.com")
-            
-            # Should still complete, just with no links
-            assert result.status == CrawlStatus.COMPLETED
-            assert result.total_pages == 1
-            assert result.total_links == 0
+        max_pages = 3
+        # The site is bigger than the cap, so the crawl must stop exactly at it
+        playwright_mock.page.links = _hrefs(max_pages + 1)
+        
+        crawler = SitemapCrawler(max_pages=max_pages, max_depth=5)
+        result = await crawler.crawl("https://example.com")
+        
+        assert result.status == CrawlStatus.COMPLETED
+        assert result.total_pages == max_pages
+
+    async def test_crawl_fills_max_pages_when_pages_fail(self, playwright_mock):
+        """Failed in-flight pages free their slot for URLs still waiting in the queue."""
+        page = playwright_mock.page
+        page.site = {"https://example.com": _hrefs(5)}
+        fake_goto = page.goto
+        loads = []
+        
+        async def goto(url, **kwargs):
+            # The first two pages after the root fail, whichever they are
+            loads.append(url)
+            response = await fake_goto(url, **kwargs)
+            return SimpleNamespace(status=500) if len(loads) in (2, 3) else response
+        
+        page.goto = goto
+        
+        crawler = SitemapCrawler(max_pages=3, max_depth=1, concurrency=4, min_delay=0)
+        result = await crawler.crawl("https://example.com")
+        
+        assert result.status == CrawlStatus.COMPLETED
+        assert result.total_pages == 3
+
+    async def test_crawl_reuses_browser_service(self, playwright_mock):
+        """A running BrowserService is used instead of launching Chromium."""
+        mock_service = MagicMock(spec_set=BrowserService, is_running=True)
+        mock_service.new_context = aret(playwright_mock.context)
+        
+        crawler = SitemapCrawler(browser_service=mock_service)
+        result = await crawler.crawl("https://example.com")
+        
+        assert result.status == CrawlStatus.COMPLETED
+        assert result.total_pages == 1
+        playwright_mock.playwright.assert_not_called()
+        assert playwright_mock.context.closed
@@ -0,0 +1,232 @@
+import hashlib
+import hmac
+import json
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import select
+from unittest.mock import patch
+
+from app.api.v1 import payment
+from app.main import app
+from app.api.v1.payment import verify_creem_signature, WEBHOOK_MAX_BODY_BYTES
+from app.models import GenerationToken, PaymentTransaction
+
+
+SECRET = b"whsec_test"
+PAYLOAD = b'{"eventType": "checkout.completed"}'
+
+
+def _sign(payload: bytes, secret: bytes = SECRET) -> str:
+    return hmac.new(secret, payload, hashlib.sha256).hexdigest()
+
+
+class TestVerifyCreemSignature:
+    """Tests for webhook signature verification."""
+
+    def test_valid_signature(self):
+        assert verify_creem_signature(PAYLOAD, _sign(PAYLOAD), SECRET) is True
+
+    def test_wrong_secret(self):
+        assert verify_creem_signature(PAYLOAD, _sign(PAYLOAD, b"other"), SECRET) is False
+
+    def test_tampered_payload(self):
+        assert verify_creem_signature(PAYLOAD + b" ", _sign(PAYLOAD), SECRET) is False
+
+    def test_malformed_signature(self):
+        """Non-hex signatures are rejected rather than compared."""
+        assert verify_creem_signature(PAYLOAD, "not-hex!", SECRET) is False
+
+
+async def test_get_products(client: AsyncClient):
+    """Products list includes the per-unit discount for larger packs."""
+    response = await client.get("/api/v1/payment/products")
+    assert response.status_code == 200
+    products = {p["sku"]: p for p in response.json()}
+    assert products["pack_5"]["price_cents"] == 499
+    assert products["pack_5"]["discount_percent"] is None
+    assert products["pack_20"]["name"] == "Pack 20"
+    assert products["pack_20"]["discount_percent"] == 24
+
+
+async def test_get_products_etag(client: AsyncClient):
+    """Repeat requests with a matching ETag get an empty 304."""
+    response = await client.get("/api/v1/payment/products")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "public, max-age=3600"
+
+    response = await client.get("/api/v1/payment/products", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+async def test_get_products_if_none_match_forms(client: AsyncClient):
+    """Tag lists, `*`, and strong or weak forms of the tag all count as a match."""
+    etag = (await client.get("/api/v1/payment/products")).headers["etag"]
+    strong = etag.removeprefix("W/")
+
+    for header in (f'"other", {etag}', "*", strong, f"W/{strong}"):
+        response = await client.get("/api/v1/payment/products", headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+
+    response = await client.get("/api/v1/payment/products", headers={"If-None-Match": '"a", "b"'})
+    assert response.status_code == 200
+
+
+async def test_webhook_rejects_bad_signature(client: AsyncClient):
+    response = await client.post(
+        "/api/v1/webhooks/creem",
+        content=PAYLOAD,
+        headers={"creem-signature": "00" * 32},
+    )
+    assert response.status_code == 400
+
+
+async def test_webhook_rejects_oversized_body(client: AsyncClient):
+    """Oversized bodies are refused before the signature is checked."""
+    response = await client.post(
+        "/api/v1/webhooks/creem",
+        content=b"x" * (WEBHOOK_MAX_BODY_BYTES + 1),
+        headers={"creem-signature": "00" * 32},
+    )
+    assert response.status_code == 413
+
+
+def _checkout_event(tx_id: str = "ch_1", **object_overrides) -> bytes:
+    checkout = {
+        "id": tx_id,
+        "metadata": {"product_sku": "pack_5", "device_id": "dev1", "generations": "5"},
+        "customer": {"email": "buyer@example.com"},
+        "order": {"amount": 499, "currency": "usd"},
+    }
+    checkout.update(object_overrides)
+    return json.dumps({"eventType": "checkout.completed", "object": checkout}).encode()
+
+
+@pytest.fixture
+async def server_error_client():
+    """Client that turns unhandled app exceptions into 500 responses, as uvicorn would."""
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+async def test_webhook_checkout_completed(client: AsyncClient, db_session):
+    """A completed checkout creates a token and its transaction."""
+    body = _checkout_event()
+    with patch.object(payment, "_WEBHOOK_SECRET", SECRET):
+        response = await client.post(
+            "/api/v1/webhooks/creem",
+            content=body,
+            headers={"creem-signature": _sign(body)},
+        )
+    assert response.status_code == 200
+    assert response.json() == {"received": True}
+
+    token = (await db_session.execute(select(GenerationToken))).scalar_one()
+    assert token.device_id == "dev1"
+    assert token.remaining_generations == 5
+    transaction = (await db_session.execute(select(PaymentTransaction))).scalar_one()
+    assert transaction.token_id == token.id
+    assert transaction.provider_transaction_id == "ch_1"
+    assert transaction.amount_cents == 499
+    assert transaction.optional_email == "buyer@example.com"
+
+
+async def test_webhook_retry_is_idempotent(client: AsyncClient, db_session):
+    """A redelivered checkout event is acknowledged without a second token."""
+    body = _checkout_event("ch_retry")
+    with patch.object(payment, "_WEBHOOK_SECRET", SECRET):
+        for _ in range(2):
+            response = await client.post(
+                "/api/v1/webhooks/creem",
+                content=body,
+                headers={"creem-signature": _sign(body)},
+            )
+            assert response.status_code == 200
+
+    tokens = (await db_session.execute(select(GenerationToken))).scalars().all()
+    assert len(tokens) == 1
+
+
+@pytest.mark.parametrize("overrides", [
+    {"order": {"currency": "usd"}},  # no amount
+    {"metadata": {"device_id": "dev1", "generations": "5"}},  # no SKU
+])
+async def test_webhook_incomplete_checkout_fails(server_error_client: AsyncClient, db_session, overrides):
+    """A checkout that cannot be recorded returns a 5xx so Creem retries, not a silent 200."""
+    body = _checkout_event("ch_incomplete", **overrides)
+    with patch.object(payment, "_WEBHOOK_SECRET", SECRET):
+        response = await server_error_client.post(
+            "/api/v1/webhooks/creem",
+            content=body,
+            headers={"creem-signature": _sign(body)},
+        )
+    assert response.status_code == 500
+    assert (await db_session.execute(select(GenerationToken))).first() is None
+
+
+async def test_webhook_checkout_without_id_issues_no_token(client: AsyncClient, db_session):
+    """Without a checkout id a replay cannot be detected, so the event is rejected."""
+    body = _checkout_event(None)
+    with patch.object(payment, "_WEBHOOK_SECRET", SECRET):
+        for _ in range(2):
+            response = await client.post(
+                "/api/v1/webhooks/creem",
+                content=body,
+                headers={"creem-signature": _sign(body)},
+            )
+            assert response.status_code == 400
+
+    assert (await db_session.execute(select(GenerationToken))).first() is None
+
+
+@pytest.mark.parametrize("event", [
+    {"eventType": "subscription.paid", "object": {"customer": "cust_1"}},
+    {"eventType": "refund.created", "object": {"order": None}},
+])
+async def test_webhook_acknowledges_other_events(client: AsyncClient, event):
+    """Non-checkout events get a 200 whatever their object looks like."""
+    body = json.dumps(event).encode()
+    with patch.object(payment, "_WEBHOOK_SECRET", SECRET):
+        response = await client.post(
+            "/api/v1/webhooks/creem",
+            content=body,
+            headers={"creem-signature": _sign(body)},
+        )
+    assert response.status_code == 200
+    assert response.json() == {"received": True}
+
+
+async def test_webhook_checkout_accepts_nulls(client: AsyncClient, db_session):
+    """Null nested objects fall back to their defaults."""
+    body = json.dumps({
+        "eventType": "checkout.completed",
+        "object": {
+            "id": "ch_nulls",
+            "metadata": {"product_sku": "pack_5", "device_id": "dev1", "generations": None},
+            "customer": None,
+            "order": {"amount": 499, "currency": None},
+        },
+    }).encode()
+    with patch.object(payment, "_WEBHOOK_SECRET", SECRET):
+        response = await client.post(
+            "/api/v1/webhooks/creem",
+            content=body,
+            headers={"creem-signature": _sign(body)},
+        )
+    assert response.status_code == 200
+
+    transaction = (await db_session.execute(select(PaymentTransaction))).scalar_one()
+    assert transaction.currency == "usd"
+    assert transaction.optional_email is None
+
+
+async def test_webhook_rejects_invalid_json(client: AsyncClient):
+    body = b"{not json"
+    with patch.object(payment, "_WEBHOOK_SECRET", SECRET):
+        response = await client.post(
+            "/api/v1/webhooks/creem",
+            content=body,
+            headers={"creem-signature": _sign(body)},
+        )
+    assert response.status_code == 400
@@ -0,0 +1,79 @@
+from datetime import timedelta
+from httpx import AsyncClient
+
+from app.core.database import utcnow
+from app.models import GenerationToken
+
+
+async def _add_token(db, device_id="dev1", generations=5, **overrides):
+    token = GenerationToken.create_token(
+        product_sku="pack_5", generations=generations, device_id=device_id
+    )
+    for key, value in overrides.items():
+        setattr(token, key, value)
+    db.add(token)
+    await db.commit()
+    return token
+
+
+async def test_tokens_by_device_lists_only_usable(client: AsyncClient, db_session):
+    """Expired and exhausted tokens are excluded from the device listing."""
+    valid = await _add_token(db_session)
+    await _add_token(db_session, remaining_generations=0)
+    await _add_token(db_session, expires_at=utcnow() - timedelta(days=1))
+    await _add_token(db_session, device_id="other")
+
+    response = await client.get("/api/v1/tokens/by-device/dev1")
+    assert response.status_code == 200
+    tokens = response.json()["tokens"]
+    assert [t["token"] for t in tokens] == [valid.token]
+    assert tokens[0]["remaining_generations"] == 5
+    assert tokens[0]["product_sku"] == "pack_5"
+
+
+async def test_token_info(client: AsyncClient, db_session):
+    """Token info is returned for known tokens and 404 otherwise."""
+    token = await _add_token(db_session)
+
+    response = await client.get(f"/api/v1/tokens/info/{token.token}")
+    assert response.status_code == 200
+    assert response.json()["total_generations"] == 5
+
+    response = await client.get("/api/v1/tokens/info/tok_missing")
+    assert response.status_code == 404
+
+
+async def test_validate_token(client: AsyncClient, db_session):
+    """Only tokens with generations left and not expired are valid."""
+    valid = await _add_token(db_session)
+    exhausted = await _add_token(db_session, remaining_generations=0)
+    expired = await _add_token(db_session, expires_at=utcnow() - timedelta(days=1))
+
+    response = await client.post("/api/v1/tokens/validate", params={"token": valid.token})
+    assert response.json() == {"valid": True}
+    for token in (exhausted, expired):
+        response = await client.post("/api/v1/tokens/validate", params={"token": token.token})
+        assert response.json() == {"valid": False}
+        assert token.is_valid is False
+    assert valid.is_valid is True
+    response = await client.post("/api/v1/tokens/validate", params={"token": "tok_missing"})
+    assert response.json() == {"valid": False}
+
+
+async def test_validate_token_is_cached(client: AsyncClient, db_session):
+    """Repeated validations within the TTL are served from the cache."""
+    token = await _add_token(db_session)
+    response = await client.post("/api/v1/tokens/validate", params={"token": token.token})
+    assert response.json() == {"valid": True}
+
+    token.remaining_generations = 0
+    await db_session.commit()
+
+    response = await client.post("/api/v1/tokens/validate", params={"token": token.token})
+    assert response.json() == {"valid": True}
+
+
+async def test_token_expiry_serialized_as_iso(client: AsyncClient, db_session):
+    token = await _add_token(db_session)
+    response = await client.get(f"/api/v1/tokens/info/{token.token}")
+    assert response.json()["expires_at"] == token.expires_at.isoformat()